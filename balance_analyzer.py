@@ -0,0 +1,128 @@
+# Offline card balance analyzer
+# Simulates lots of battles with battle_engine (the same rules /battle uses) and reports
+# how the cards in cards.py stack up against each other. Doesn't need the bot or a token.
+#
+# Usage: python balance_analyzer.py [--battles 1000000] [--per-pair 200] [--workers N]
+#                                   [--seed 235] [--spawnable-only] [--json results.json]
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cards import cards
+from battle_engine import battle_card, simulate_battle, CHALLENGER
+
+MAX_TEAM_SIZE = 3  # Same limit as CardSelectionView
+CHUNK_SIZE = 20000
+
+def run_pairs(card_list, rows, per_pair, seed):
+    """1v1 wins for each card index in rows against every card, half the fights going first."""
+    rng = random.Random(seed)
+    wins = {}
+    for i in rows:
+        row = []
+        for j in range(len(card_list)):
+            won = 0
+            for n in range(per_pair):
+                if n % 2:
+                    won += simulate_battle([card_list[j]], [card_list[i]], rng).winner != CHALLENGER
+                else:
+                    won += simulate_battle([card_list[i]], [card_list[j]], rng).winner == CHALLENGER
+            row.append(won)
+        wins[i] = row
+    return wins
+
+def run_teams(card_list, battles, seed):
+    """Random team battles, returning per-card (appearances, wins) and first mover wins."""
+    rng = random.Random(seed)
+    indexes = range(len(card_list))
+    appearances = [0] * len(card_list)
+    wins = [0] * len(card_list)
+    challenger_wins = 0
+    for _ in range(battles):
+        teams = [rng.sample(indexes, rng.randint(1, min(MAX_TEAM_SIZE, len(card_list)))) for _ in range(2)]
+        result = simulate_battle([card_list[i] for i in teams[0]], [card_list[i] for i in teams[1]], rng)
+        challenger_wins += result.winner == CHALLENGER
+        for side, team in enumerate(teams):
+            for i in team:
+                appearances[i] += 1
+                wins[i] += result.winner == side
+    return appearances, wins, challenger_wins
+
+def analyze(card_list, battles, per_pair, workers, seed):
+    names = [card['name'] for card in card_list]
+    seeds = random.Random(seed)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # One job per matrix row and per chunk of team battles, so results don't depend on workers
+        pair_jobs = [pool.submit(run_pairs, card_list, [i], per_pair, seeds.random()) for i in range(len(card_list))]
+        team_jobs = [pool.submit(run_teams, card_list, min(CHUNK_SIZE, battles - start), seeds.random())
+                     for start in range(0, battles, CHUNK_SIZE)]
+
+        matrix = [None] * len(card_list)
+        for job in pair_jobs:
+            for i, row in job.result().items():
+                matrix[i] = [won / per_pair for won in row] if per_pair else [0.0] * len(card_list)
+
+        appearances = [0] * len(card_list)
+        wins = [0] * len(card_list)
+        challenger_wins = 0
+        for job in team_jobs:
+            job_appearances, job_wins, job_challenger_wins = job.result()
+            appearances = [a + b for a, b in zip(appearances, job_appearances)]
+            wins = [a + b for a, b in zip(wins, job_wins)]
+            challenger_wins += job_challenger_wins
+
+    # Power is how much a card moves its team's win rate away from a coin flip
+    power = {name: (wins[i] / appearances[i] - 0.5) * 2 if appearances[i] else 0.0
+             for i, name in enumerate(names)}
+    return {
+        'cards': names,
+        'win_rate_matrix': matrix,
+        'team_win_rate': {name: wins[i] / appearances[i] if appearances[i] else None for i, name in enumerate(names)},
+        'power': power,
+        'challenger_win_rate': challenger_wins / battles if battles else None,
+        'battles': battles,
+        'per_pair': per_pair,
+    }
+
+def print_report(results):
+    names = results['cards']
+    print(f"\n{results['battles']} random team battles, {results['per_pair']} fights per 1v1 pairing")
+    if results['challenger_win_rate'] is not None:
+        print(f"Challenger (moves first) wins {results['challenger_win_rate']:.1%} of team battles")
+
+    print("\nPower scores (-1 = always loses, 0 = coin flip, 1 = always wins)")
+    width = max(len(name) for name in names)
+    for name in sorted(names, key=lambda name: results['power'][name], reverse=True):
+        team_win_rate = results['team_win_rate'][name]
+        row = results['win_rate_matrix'][names.index(name)]
+        one_v_one = sum(row) / len(row)
+        team_str = f"{team_win_rate:6.1%}" if team_win_rate is not None else "   n/a"
+        print(f"  {name:<{width}}  power {results['power'][name]:+.3f}  team win {team_str}  1v1 win {one_v_one:6.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate card battles to check card balance.")
+    parser.add_argument('--battles', type=int, default=1_000_000, help="random team battles to simulate")
+    parser.add_argument('--per-pair', type=int, default=200, help="1v1 fights per card pairing for the win rate matrix")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--seed', type=int, default=235)
+    parser.add_argument('--spawnable-only', action='store_true', help="leave out cards with rarity 0")
+    parser.add_argument('--json', help="also write the full results, including the matrix, to this file")
+    args = parser.parse_args()
+
+    card_list = [battle_card(card) for card in cards if card['rarity'] > 0 or not args.spawnable_only]
+    started = time.perf_counter()
+    results = analyze(card_list, args.battles, args.per_pair, max(1, args.workers), args.seed)
+    print_report(results)
+    print(f"\nDone in {time.perf_counter() - started:.1f}s with {max(1, args.workers)} workers")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f"Full results written to {args.json}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# Card battle rules
+# Whole battles are fought here up front, CardBattle in dextest.py just replays the turn log on Discord
+import random
+from typing import List, NamedTuple
+
+CRIT_CHANCE = 0.25
+CRIT_MULTIPLIER = 1.25
+
+CHALLENGER = 0
+OPPONENT = 1
+
+class Turn(NamedTuple):
+    side: int  # Side that attacks this turn, CHALLENGER or OPPONENT
+    attacker: int  # Index of the attacking card in its team
+    defender: int  # Index of the defending card in its team
+    damage: int
+    crit: bool
+    defender_health: int  # Health left after the hit, defeated if <= 0
+
+class BattleResult(NamedTuple):
+    winner: int  # CHALLENGER or OPPONENT
+    turns: List[Turn]
+
+def battle_card(card: dict) -> dict:
+    """The {'name', 'health', 'attack'} copy of a cards.py card that battles use, attack defaulting to 1."""
+    return {'name': card['name'], 'health': card['health'], 'attack': card.get('attack', 1)}
+
+def simulate_battle(challenger_cards: list[dict], opponent_cards: list[dict], rng=None) -> BattleResult:
+    """Fight a whole battle between two teams of {'name', 'health', 'attack'} cards.
+
+    Sides take turns attacking, challenger first. Each turn a random living card
+    hits a random living enemy card, with a CRIT_CHANCE chance of doing
+    CRIT_MULTIPLIER times its attack. A seeded random.Random as rng replays the
+    same battle. The teams aren't modified.
+    """
+    rng = rng or random
+    health = ([card['health'] for card in challenger_cards], [card['health'] for card in opponent_cards])
+    attack = ([card['attack'] for card in challenger_cards], [card['attack'] for card in opponent_cards])
+    alive = (list(range(len(challenger_cards))), list(range(len(opponent_cards))))
+    turns = []
+
+    side = CHALLENGER
+    while alive[CHALLENGER] and alive[OPPONENT]:
+        other = 1 - side
+        attacker = rng.choice(alive[side])
+        defender = rng.choice(alive[other])
+
+        damage = attack[side][attacker]
+        crit = rng.random() < CRIT_CHANCE
+        if crit:
+            damage = int(damage * CRIT_MULTIPLIER)
+
+        health[other][defender] -= damage
+        if health[other][defender] <= 0:
+            alive[other].remove(defender)
+        turns.append(Turn(side, attacker, defender, damage, crit, health[other][defender]))
+        side = other
+
+    winner = CHALLENGER if not alive[OPPONENT] else OPPONENT
+    return BattleResult(winner, turns)
+
+def replay_battle(challenger_cards: list[dict], opponent_cards: list[dict], turns: List[Turn]):
+    """Yield (turn number, turn, teams) after each turn, for showing a battle step by step.
+
+    teams holds the living cards of both sides as [[name, health], ...] lists, in the
+    order they were picked. The same lists are updated and yielded every time.
+    """
+    teams = ([[card['name'], card['health']] for card in challenger_cards],
+             [[card['name'], card['health']] for card in opponent_cards])
+    alive = ([True] * len(challenger_cards), [True] * len(opponent_cards))
+    living = ([], [])
+    for number, turn in enumerate(turns, start=1):
+        other = 1 - turn.side
+        teams[other][turn.defender][1] = turn.defender_health
+        if turn.defender_health <= 0:
+            alive[other][turn.defender] = False
+        for side in (CHALLENGER, OPPONENT):
+            living[side][:] = [card for card, is_alive in zip(teams[side], alive[side]) if is_alive]
+        yield number, turn, living
+
+def estimate_win_rate(challenger_cards: list[dict], opponent_cards: list[dict], battles: int = 300, seed: int = 0) -> float:
+    """Fraction of battles the challenger wins, from battles seeded simulations."""
+    rng = random.Random(seed)
+    wins = sum(simulate_battle(challenger_cards, opponent_cards, rng).winner == CHALLENGER for _ in range(battles))
+    return wins / battles
@@ -11,8 +11,20 @@ import time
 import aiohttp
 import datetime
 import shutil
+import queue
+import threading
+import concurrent.futures
+import sqlite3
+import contextlib
+import heapq
+import math
+import functools
+import bisect
+import struct
+import zlib
 
 from typing import List
+from types import MappingProxyType
 from collections import Counter
 from aiohttp import client_exceptions
 
@@ -24,6 +36,8 @@ from dotenv import load_dotenv # type: ignore //please ensure that you have pyth
 
 # Import the cards list from cards.py
 from cards import cards
+from battle_engine import battle_card, simulate_battle, replay_battle, estimate_win_rate, CHALLENGER
+from spawn_sampling import SpawnSampler
 
 #=================================================================
 # CONFIG & GLOBALS
@@ -39,6 +53,8 @@ channel_ids_str = os.getenv('CHANNEL_IDS', '')
 channel_ids = [id.strip() for id in channel_ids_str.split(',') if id.strip()]
 test_channel_id = os.getenv('TEST_CHANNEL_ID')
 spawn_mode = os.getenv('SPAWN_MODE', 'both').lower()
+storage_backend = os.getenv('STORAGE_BACKEND', 'json').lower()
+database_file = os.getenv('DATABASE_FILE', 'dex.db')
 
 missing_vars = []
 if not token:
@@ -67,12 +83,19 @@ bot = commands.Bot(command_prefix='!', intents=intents)
 
 # Global state variables
 player_cards = {}
+stats_file = "stats.json"
+activity_log_file = "activity.log"
+activity_rollups_file = "activity_rollups.json"
+ACTIVITY_HOURLY_RETENTION_DAYS = 14
+STATS_CHECKPOINT_SECONDS = 60
+inventory_version = 0  # Goes up on every inventory change, for caches built from player_cards
+inventory_listeners = []  # Objects with rebuild(player_cards) and apply(applied ops), kept in sync with player_cards
 last_spawned_card_per_channel = {}
 spawned_messages = []
+spawn_latency_per_channel = {}  # channel ID -> seconds the last spawn send took
+channel_edit_budgets = {}  # channel ID -> ChannelEditBudget shared by battles shown there
+SPAWN_CONCURRENCY = 10
 allowed_guilds = [int(test_channel_id)] + [int(channel_id) for channel_id in channel_ids]
-battle_lock = asyncio.Lock()
-trade_lock = asyncio.Lock()
-submit_lock = asyncio.Lock()
 is_test_mode = spawn_mode == 'test'
 blacklist_file = "blacklist.json"
 start_time = datetime.datetime.now()
@@ -83,6 +106,10 @@ backup_folder = "backup_folder"
 os.makedirs(backup_folder, exist_ok=True)
 MAX_BACKUPS = 6
 
+journal_file = "player_cards.journal"
+JOURNAL_GENERATION_KEY = "_journal_generation"  # Stored inside player_cards.json, never a user ID
+JOURNAL_COMPACT_THRESHOLD = 500
+
 authorized_user_ids = os.getenv('AUTHORIZED_USER_IDS', '').split(',')
 authorized_user_ids = [user_id.strip() for user_id in authorized_user_ids if user_id.strip().isdigit()]
 logging.info(f"Authorized user IDs loaded.")
@@ -121,23 +148,115 @@ def requires_valid_user():
 
     return commands.check(predicate)
 
-def weighted_random_choice(cards: list[dict]) -> dict:
-    total = sum(card['rarity'] for card in cards)
-    r = random.uniform(0, total)
-    upto = 0
-    for card in cards:
-        upto += card['rarity']
-        if upto >= r:
-            return card
-    return None
+# Card catalog
+class CardCatalog:
+    """Read-only index over the cards list with constant time name and alias lookups.
 
-def user_has_card(user_id: str, card_name: str) -> bool:
+    Records are immutable views of the card dicts, so they can be handed around
+    without anyone accidentally editing the card data. Every card name also gets
+    a small integer id (its position in cards.py) for compact inventories. Names
+    that aren't in the catalog, like cards made up by admins, are interned with
+    ids after the real cards.
+    """
+    def __init__(self, card_list: list[dict]):
+        self.cards = tuple(MappingProxyType(dict(card)) for card in card_list)
+        self._by_name = {}
+        self._by_alias = {}
+        self._match_keys = {}
+        self._names = []
+        self._ids = {}
+        self._ids_by_key = {}
+        self._alias_ids = {}
+        for card in self.cards:
+            name_key = self._key(card['name'])
+            alias_keys = {self._key(alias) for alias in card.get('aliases', [])}
+            self._by_name.setdefault(name_key, card)
+            for alias_key in alias_keys:
+                self._by_alias.setdefault(alias_key, card)
+            self._match_keys[name_key] = frozenset(alias_keys | {name_key})
+            card_id = self.intern(card['name'])
+            for alias_key in alias_keys:
+                self._alias_ids.setdefault(alias_key, card_id)
+
+    def intern(self, card_name: str) -> int:
+        """Return the id for card_name, assigning a new one if it has never been seen."""
+        card_id = self._ids.get(card_name)
+        if card_id is None:
+            card_id = self._ids[card_name] = len(self._names)
+            self._names.append(card_name)
+            self._ids_by_key.setdefault(self._key(card_name), []).append(card_id)
+        return card_id
+
+    def card_id(self, card_name: str):
+        """Return the id for exactly card_name without interning it, or None."""
+        return self._ids.get(card_name)
+
+    def name_of(self, card_id: int) -> str:
+        return self._names[card_id]
+
+    def candidate_ids(self, name_or_alias: str) -> list[int]:
+        """Ids a user could mean by name_or_alias: names ignoring case first, then an alias."""
+        key = self._key(name_or_alias)
+        candidates = list(self._ids_by_key.get(key, ()))
+        if key in self._alias_ids:
+            candidates.append(self._alias_ids[key])
+        return candidates
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return name.casefold()
+
+    def __iter__(self):
+        return iter(self.cards)
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def get(self, card_name: str):
+        """Look up a card by its name, ignoring case."""
+        return self._by_name.get(self._key(card_name))
+
+    def resolve(self, name_or_alias: str):
+        """Look up a card by its name or one of its aliases, ignoring case."""
+        key = self._key(name_or_alias)
+        return self._by_name.get(key) or self._by_alias.get(key)
+
+    def matches(self, card_name: str, guess: str) -> bool:
+        """Check whether guess is card_name or one of its aliases."""
+        return self._key(guess) in self._match_keys.get(self._key(card_name), ())
+
+    def rarity(self, card_name: str, default=100):
+        card = self.get(card_name)
+        return card['rarity'] if card else default
+
+catalog = CardCatalog(cards)
+
+# Cards the rarity leaderboards rank, rarest first. Other rarity 0 cards can't be caught
+rarity_ranking = sorted(((card['name'], card['rarity']) for card in catalog
+                         if card['rarity'] > 0 or card['name'] == "Sigma-squad"), key=lambda x: x[1])
+
+def rarest_with_copies(copies: Counter):
+    """(card name, rarity) of the rarest ranked card with copies in a card ID -> copies Counter, or None."""
+    return next(((name, rarity) for name, rarity in rarity_ranking if copies[catalog.card_id(name)]), None)
+
+# Spawn sampling, weighted by rarity
+spawn_sampler = SpawnSampler(catalog)
+
+def find_card_in(card_names: list[str], card_name: str):
+    """Return the entry of card_names that is card_name or one of its aliases, or None."""
+    card = catalog.resolve(card_name)
+    if card and card['name'] in card_names:
+        return card['name']
+    # Cards given by admins don't have to exist in the catalog
     card_name = card_name.lower()
-    for card in player_cards.get(user_id, []):
-        card_aliases = next((c.get('aliases', []) for c in cards if c['name'].lower() == card.lower()), [])
-        if card_name == card.lower() or card_name in [alias.lower() for alias in card_aliases]:
-            return True
-    return False
+    return next((c for c in card_names if c.lower() == card_name), None)
+
+def find_owned_card(user_id: str, card_name: str):
+    """Return the owned card matching card_name or one of its aliases, or None."""
+    return get_inventory(user_id).find(card_name)
+
+def user_has_card(user_id: str, card_name: str) -> bool:
+    return find_owned_card(user_id, card_name) is not None
 
 def validate_card_data():
     """Validate that all cards have required fields"""
@@ -173,13 +292,6 @@ def get_spawn_channels():
     
     return channels
 
-def select_random_card(exclude_card_name=None):
-    """Select a random card, optionally excluding a specific card name."""
-    available_cards = [card for card in cards if card['name'] != exclude_card_name] if exclude_card_name else cards
-    if not available_cards:
-        return random.choice(cards)  # fallback, should not happen
-    return weighted_random_choice(available_cards)
-
 def count_lines_of_code() -> int:
     project_dir = os.path.dirname(os.path.abspath(__file__))
     total_lines_of_code = 0
@@ -230,93 +342,865 @@ def update_user_stats(user_id: str, stat_type: str, value: int = 1):
             'cards_caught': 0
         }
     user_stats[user_id][stat_type] += value
+    stats_checkpointer.dirty_users.add(user_id)
 
 def update_trade_stats(card_name: str):
     """Update card trade statistics"""
     if card_name not in trade_stats:
         trade_stats[card_name] = 0
     trade_stats[card_name] += 1
+    stats_checkpointer.dirty_cards.add(card_name)
 #=================================================================
 # DATA MANAGEMENT
 #=================================================================
 # Blacklist management
 class BlacklistManager:
+    """Blacklist backed by an in-memory set, so checks on the interaction path never touch disk.
+
+    The set is loaded once and updated in place by add/remove. refresh() reloads
+    it when the stored blacklist was changed by something else, e.g. a hand-edited
+    blacklist.json, and is polled by refresh_blacklist_cache.
+    """
+    _cache = None
+    _version = None
+
     @staticmethod
     def load_blacklist() -> List[str]:
-        try:
-            with open(blacklist_file, "r") as f:
-                data = f.read().strip()
-                if not data:
-                    return []
-                return json.loads(data)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            logging.error(f"Error loading blacklist: {e}")
-            return []
+        return storage.load_blacklist()
+
+    @classmethod
+    def save_blacklist(cls, blacklist: List[str]) -> None:
+        storage.save_blacklist(blacklist)
+        cls._version = storage.blacklist_version()
+
+    @classmethod
+    def _blacklist(cls) -> set:
+        if cls._cache is None:
+            cls._version = storage.blacklist_version()
+            cls._cache = set(cls.load_blacklist())
+        return cls._cache
+
+    @classmethod
+    def refresh(cls) -> bool:
+        """Reload the cache if the stored blacklist changed behind our back."""
+        version = storage.blacklist_version()
+        if cls._cache is not None and version == cls._version:
+            return False
+        cls._version = version
+        cls._cache = set(cls.load_blacklist())
+        logging.info(f"Blacklist reloaded: {len(cls._cache)} users")
+        return True
 
-    @staticmethod
-    def save_blacklist(blacklist: List[str]) -> None:
-        try:
-            with open(blacklist_file, "w") as f:
-                json.dump(blacklist, f)
-        except Exception as e:
-            logging.error(f"Error saving blacklist: {e}")
+    @classmethod
+    def blacklisted_ids(cls) -> List[str]:
+        return sorted(cls._blacklist())
 
-    @staticmethod
-    def is_blacklisted(user_id: str) -> bool:
-        blacklist = BlacklistManager.load_blacklist()
-        return user_id in blacklist
+    @classmethod
+    def is_blacklisted(cls, user_id: str) -> bool:
+        return user_id in cls._blacklist()
     
-    @staticmethod
-    def add_to_blacklist(user_id: str) -> bool:
-        blacklist = BlacklistManager.load_blacklist()
+    @classmethod
+    def add_to_blacklist(cls, user_id: str) -> bool:
+        blacklist = cls._blacklist()
         if user_id in blacklist:
             return False
-        blacklist.append(user_id)
-        BlacklistManager.save_blacklist(blacklist)
+        blacklist.add(user_id)
+        cls.save_blacklist(sorted(blacklist))
         return True
     
-    @staticmethod
-    def remove_from_blacklist(user_id: str) -> bool:
-        blacklist = BlacklistManager.load_blacklist()
+    @classmethod
+    def remove_from_blacklist(cls, user_id: str) -> bool:
+        blacklist = cls._blacklist()
         if user_id not in blacklist:
             return False
-        blacklist.remove(user_id)
-        BlacklistManager.save_blacklist(blacklist)
+        blacklist.discard(user_id)
+        cls.save_blacklist(sorted(blacklist))
         return True
 
+@tasks.loop(seconds=30)
+async def refresh_blacklist_cache():
+    try:
+        BlacklistManager.refresh()
+    except Exception as e:
+        logging.error(f"Failed to refresh blacklist cache: {e}")
+
+# Per-user locks
+class UserLockManager:
+    """Locks keyed by user ID for anything that reads then changes inventories.
+
+    Always take every lock you need in one hold() call. It acquires them in
+    sorted user ID order, so two tasks locking overlapping users can never
+    deadlock. Locks are dropped once nobody holds or waits on them.
+    """
+    def __init__(self):
+        self._locks = {}
+        self._users = {}  # user ID -> number of holders and waiters
+
+    @contextlib.asynccontextmanager
+    async def hold(self, *user_ids):
+        user_ids = sorted(set(user_ids))
+        for user_id in user_ids:
+            self._users[user_id] = self._users.get(user_id, 0) + 1
+        acquired = []
+        try:
+            for user_id in user_ids:
+                lock = self._locks.setdefault(user_id, asyncio.Lock())
+                await lock.acquire()
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+            for user_id in user_ids:
+                self._users[user_id] -= 1
+                if not self._users[user_id]:
+                    del self._users[user_id]
+                    del self._locks[user_id]
+
+user_locks = UserLockManager()
+
+# Session deadlines
+class DeadlineScheduler:
+    """One timer for every trade and battle inactivity timeout.
+
+    Deadlines live in a heap keyed by session, with a single loop.call_at()
+    armed for the earliest one. Rescheduling pushes a new heap entry in
+    O(log n) and leaves the old one to be skipped when it reaches the top.
+    Callbacks may be coroutine functions, which run as tasks.
+    """
+    def __init__(self):
+        self._heap = []  # (when, seq, session)
+        self._deadlines = {}  # session -> (when, seq, callback)
+        self._seq = 0
+        self._timer = None
+        self._timer_when = None
+
+    def schedule(self, session, delay: float, callback) -> None:
+        """Call callback() delay seconds from now unless session is rescheduled or cancelled first."""
+        loop = asyncio.get_running_loop()
+        when = loop.time() + delay
+        self._seq += 1
+        self._deadlines[session] = (when, self._seq, callback)
+        heapq.heappush(self._heap, (when, self._seq, session))
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(when, seq, s) for s, (when, seq, _) in self._deadlines.items()]
+            heapq.heapify(self._heap)
+        self._arm(loop)
+
+    def reschedule(self, session, delay: float) -> None:
+        """Push session's deadline back to delay seconds from now, if it has one."""
+        if session in self._deadlines:
+            self.schedule(session, delay, self._deadlines[session][2])
+
+    def cancel(self, session) -> None:
+        self._deadlines.pop(session, None)
+
+    def live_sessions(self) -> Counter:
+        """Sessions with a pending deadline, counted by type."""
+        return Counter(type(session).__name__ for session in self._deadlines)
+
+    @property
+    def pending_deadlines(self) -> int:
+        return len(self._deadlines)
+
+    def _arm(self, loop):
+        while self._heap:
+            when, seq, session = self._heap[0]
+            entry = self._deadlines.get(session)
+            if entry is not None and entry[1] == seq:
+                break
+            heapq.heappop(self._heap)  # Cancelled or superseded
+        else:
+            return
+        if self._timer is not None:
+            if self._timer_when <= when:
+                return
+            self._timer.cancel()
+        self._timer_when = when
+        self._timer = loop.call_at(when, self._fire)
+
+    def _fire(self):
+        loop = asyncio.get_running_loop()
+        self._timer = None
+        now = loop.time()
+        while self._heap and self._heap[0][0] <= now:
+            when, seq, session = heapq.heappop(self._heap)
+            entry = self._deadlines.get(session)
+            if entry is None or entry[1] != seq:
+                continue
+            del self._deadlines[session]
+            try:
+                result = entry[2]()
+                if asyncio.iscoroutine(result):
+                    loop.create_task(result)
+            except Exception as e:
+                logging.error(f"Error in timeout callback for {type(session).__name__}: {e}", exc_info=True)
+        self._arm(loop)
+
+session_deadlines = DeadlineScheduler()
+
+# Persistence worker
+class PersistenceWorker:
+    """Runs blocking disk writes on a background thread so they never stall the event loop.
+
+    Jobs run one at a time in submission order. Jobs submitted with a coalesce_key
+    replace any job with the same key that hasn't started yet, so a burst of save
+    requests only writes the latest state once.
+    """
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="persistence-worker", daemon=True)
+            self._thread.start()
+
+    def submit(self, job, coalesce_key=None) -> asyncio.Future:
+        """Queue job() and return a future that resolves once it has run."""
+        self.start()
+        with self._pending_lock:
+            if coalesce_key is not None and coalesce_key in self._pending:
+                pending = self._pending[coalesce_key]
+                pending[0] = job
+                future = pending[1]
+            else:
+                future = concurrent.futures.Future()
+                if coalesce_key is not None:
+                    self._pending[coalesce_key] = [job, future]
+                self._queue.put((coalesce_key, job, future))
+        return asyncio.wrap_future(future)
+
+    def _run(self) -> None:
+        while True:
+            coalesce_key, job, future = self._queue.get()
+            if job is None:
+                break
+            if coalesce_key is not None:
+                with self._pending_lock:
+                    job = self._pending.pop(coalesce_key)[0]
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(job())
+            except Exception as e:
+                logging.error(f"Persistence job failed: {e}", exc_info=True)
+                future.set_exception(e)
+
+    def stop(self, timeout: float = 30) -> None:
+        """Finish every queued job, then stop the worker thread."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put((None, None, None))
+        self._thread.join(timeout)
+
+persistence_worker = PersistenceWorker()
+
+# Inventory journal
+class InventoryJournal:
+    """Append-only log of inventory changes, replayed on top of player_cards.json at startup.
+
+    Every line is one batch of ops that must be applied together, tagged with the
+    generation it belongs to. A compaction writes a fresh snapshot stamped with the
+    next generation, so lines from older generations are skipped on replay even if
+    the bot died before the journal could be truncated.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.generation = 0
+        self.entries = 0
+
+    def append(self, ops: list, generation: int) -> None:
+        line = json.dumps({"gen": generation, "ops": ops}, separators=(',', ':'))
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def replay(self, inventory: dict) -> int:
+        """Apply every journal entry from the current generation onwards to inventory."""
+        if not os.path.exists(self.path):
+            return 0
+        replayed = 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Lines are appended whole and fsynced, so only the last one can be half written
+                    logging.warning(f"Ignoring unreadable journal entry at line {line_number}")
+                    break
+                if entry.get("gen", 0) < self.generation:
+                    continue
+                apply_inventory_ops(inventory, entry["ops"])
+                replayed += 1
+        self.entries = replayed
+        return replayed
+
+    def record(self, ops: list) -> asyncio.Future:
+        """Queue ops for appending, the returned future resolves once they are fsynced."""
+        self.entries += 1
+        generation = self.generation
+        return persistence_worker.submit(lambda: self.append(ops, generation))
+
+    def compact(self, inventory: dict) -> asyncio.Future:
+        """Fold the journal into a new player_cards.json snapshot of inventory and truncate it.
+
+        The snapshot is copied here on the event loop so the worker thread writes a
+        consistent state. Compactions that pile up behind a slow write are coalesced.
+        """
+        self.generation += 1
+        self.entries = 0
+        generation = self.generation
+        snapshot = inventories_to_json(inventory)
+
+        def write_snapshot():
+            if not save_player_cards(snapshot, generation):
+                raise OSError("Snapshot failed, keeping the inventory journal")
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.flush()
+                os.fsync(f.fileno())
+            logging.info(f"Compacted inventory journal into snapshot (generation {generation})")
+
+        return persistence_worker.submit(write_snapshot, coalesce_key="snapshot")
+
+inventory_journal = InventoryJournal(journal_file)
+
+# Activity log
+class ActivityLog:
+    """Append-only binary log of catches, trades, gives and battles, counted into hourly and daily rollups as they happen."""
+    RECORD = struct.Struct("<dBQQQIi")  # time, kind, channel ID, user ID, other user ID, card, value
+    KINDS = ("catch", "trade", "give", "battle")
+    HOUR = 3600
+    DAY = 86400
+
+    def __init__(self, path: str, rollups_path: str):
+        self.path = path
+        self.rollups_path = rollups_path
+        self._buffer = bytearray()
+        self._cards_by_hash = {zlib.crc32(card['name'].encode()): card['name'] for card in catalog}
+        self._reset_rollups()
+
+    def _reset_rollups(self):
+        # kind -> bucket start -> Counter of channel ID -> events
+        self.hourly = {kind: {} for kind in self.KINDS}
+        self.daily = {kind: {} for kind in self.KINDS}
+
+    def _count(self, kind: str, timestamp: float, channel_id: int) -> None:
+        hour = int(timestamp) - int(timestamp) % self.HOUR
+        day = int(timestamp) - int(timestamp) % self.DAY
+        self.hourly[kind].setdefault(hour, Counter())[channel_id] += 1
+        self.daily[kind].setdefault(day, Counter())[channel_id] += 1
+
+    def emit(self, kind: str, channel_id=None, user_id=None, other_id=None, card_name=None, value: int = 0) -> None:
+        """Record one event now. IDs may be ints or digit strings, missing ones are stored as 0."""
+        timestamp = time.time()
+        channel_id = int(channel_id or 0)
+        card = zlib.crc32(card_name.encode()) if card_name else 0
+        self._buffer += self.RECORD.pack(timestamp, self.KINDS.index(kind) + 1, channel_id,
+                                         int(user_id or 0), int(other_id or 0), card, value)
+        self._count(kind, timestamp, channel_id)
+
+    def checkpoint(self) -> asyncio.Future:
+        """Append the buffered records and save the rollups with the log size they cover, as one worker job."""
+        records, self._buffer = bytes(self._buffer), bytearray()
+        self._prune_hourly()
+        rollups = {
+            "hourly": {kind: {hour: dict(channels) for hour, channels in buckets.items()} for kind, buckets in self.hourly.items()},
+            "daily": {kind: {day: dict(channels) for day, channels in buckets.items()} for kind, buckets in self.daily.items()},
+        }
+
+        def flush_and_save_rollups():
+            if records:
+                with open(self.path, 'ab') as f:
+                    f.write(records)
+                    f.flush()
+                    os.fsync(f.fileno())
+            rollups["offset"] = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            temp_file = self.rollups_path + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(rollups, f, separators=(',', ':'))
+            os.replace(temp_file, self.rollups_path)
+        return persistence_worker.submit(flush_and_save_rollups)
+
+    def _prune_hourly(self) -> None:
+        cutoff = time.time() - ACTIVITY_HOURLY_RETENTION_DAYS * self.DAY
+        for buckets in self.hourly.values():
+            for hour in [hour for hour in buckets if hour < cutoff]:
+                del buckets[hour]
+
+    def load(self) -> int:
+        """Load the saved rollups and replay the records logged after them. Returns how many were replayed."""
+        self._reset_rollups()
+        offset = 0
+        try:
+            with open(self.rollups_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            for granularity in ("hourly", "daily"):
+                rollups = getattr(self, granularity)
+                for kind, buckets in saved.get(granularity, {}).items():
+                    if kind in rollups:
+                        rollups[kind].update({int(start): Counter({int(channel): count for channel, count in channels.items()})
+                                              for start, channels in buckets.items()})
+            offset = saved.get("offset", 0)
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, ValueError, AttributeError) as e:
+            logging.error(f"Error loading activity rollups, rebuilding them from the log: {e}")
+            self._reset_rollups()
+
+        if not os.path.exists(self.path):
+            return 0
+        size = os.path.getsize(self.path)
+        if size % self.RECORD.size:
+            # Records are fixed size, so a length that isn't a multiple means the last append was cut short
+            logging.warning(f"Dropping a partial activity record at the end of {self.path}")
+            size -= size % self.RECORD.size
+            with open(self.path, 'r+b') as f:
+                f.truncate(size)
+        if offset > size or offset % self.RECORD.size:
+            logging.warning("Activity rollups don't match the log, rebuilding them")
+            self._reset_rollups()
+            offset = 0
+
+        replayed = 0
+        for record in self.read(offset):
+            self._count(record[1], record[0], record[2])
+            replayed += 1
+        self._prune_hourly()
+        return replayed
+
+    def read(self, offset: int = 0):
+        """Yield logged events from offset on as (time, kind, channel ID, user ID, other user ID, card name, value).
+
+        Only for digging into raw history, the rollups answer counting questions.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            while chunk := f.read(self.RECORD.size * 4096):
+                for timestamp, kind, channel_id, user_id, other_id, card, value in self.RECORD.iter_unpack(chunk):
+                    yield (timestamp, self.KINDS[kind - 1], channel_id, user_id, other_id,
+                           self._cards_by_hash.get(card) if card else None, value)
+
+    def count(self, kind: str, start: float, end: float = None, channel_id=None) -> int:
+        """Events of kind in [start, end), optionally in one channel.
+
+        Uses the daily rollups when both ends are on a UTC day boundary and the hourly ones
+        otherwise, which only reach back ACTIVITY_HOURLY_RETENTION_DAYS.
+        """
+        return sum(self.series(kind, start, end, channel_id).values())
+
+    def series(self, kind: str, start: float, end: float = None, channel_id=None, granularity: str = None) -> dict:
+        """{bucket start: events} for every bucket of kind in [start, end)."""
+        end = time.time() if end is None else end
+        if granularity is None:
+            granularity = "daily" if start % self.DAY == 0 and end % self.DAY == 0 else "hourly"
+        step = self.DAY if granularity == "daily" else self.HOUR
+        buckets = getattr(self, granularity)[kind]
+        first = int(start) - int(start) % step
+        result = {}
+        for bucket in range(first, int(math.ceil(end)), step):
+            channels = buckets.get(bucket)
+            if channels:
+                result[bucket] = channels.get(int(channel_id), 0) if channel_id is not None else sum(channels.values())
+        return result
+
+activity_log = ActivityLog(activity_log_file, activity_rollups_file)
+
+# Inventories
+class Inventory:
+    """One user's cards as catalog card id -> count.
+
+    Total and unique counts are free, ownership checks by name or alias are O(1),
+    and duplicates cost one integer instead of another string in a list. Converts
+    to and from the card name lists stored in player_cards.json without losing
+    anything but the order of the list. version goes up on every change, for
+    optimistic checks by transfer_cards().
+    """
+    __slots__ = ('counts', 'total', 'version')
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.version = 0
+
+    @classmethod
+    def from_card_list(cls, card_names: list[str]) -> "Inventory":
+        inventory = cls()
+        for card_name in card_names:
+            inventory.add(card_name)
+        return inventory
+
+    def to_card_list(self) -> list[str]:
+        card_list = []
+        for card_id, count in self.counts.items():
+            card_list.extend([catalog.name_of(card_id)] * count)
+        return card_list
+
+    def add(self, card_name: str, count: int = 1) -> None:
+        card_id = catalog.intern(card_name)
+        self.counts[card_id] = self.counts.get(card_id, 0) + count
+        self.total += count
+        self.version += 1
+
+    def remove(self, card_name: str) -> bool:
+        """Remove one copy of exactly card_name, returning False if there is none."""
+        card_id = catalog.card_id(card_name)
+        count = self.counts.get(card_id, 0)
+        if not count:
+            return False
+        if count == 1:
+            del self.counts[card_id]
+        else:
+            self.counts[card_id] = count - 1
+        self.total -= 1
+        self.version += 1
+        return True
+
+    def find(self, card_name: str):
+        """Return the owned card that is card_name or one of its aliases, or None."""
+        for card_id in catalog.candidate_ids(card_name):
+            if card_id in self.counts:
+                return catalog.name_of(card_id)
+        return None
+
+    def count(self, card_name: str) -> int:
+        """How many copies of card_name (matched like find()) are owned."""
+        for card_id in catalog.candidate_ids(card_name):
+            if card_id in self.counts:
+                return self.counts[card_id]
+        return 0
+
+    def has(self, card_name: str) -> bool:
+        """Check for exactly card_name, without alias matching."""
+        return catalog.card_id(card_name) in self.counts
+
+    def unique(self) -> list[str]:
+        return [catalog.name_of(card_id) for card_id in self.counts]
+
+    @property
+    def unique_count(self) -> int:
+        return len(self.counts)
+
+    def items(self):
+        """(card name, count) pairs."""
+        return ((catalog.name_of(card_id), count) for card_id, count in self.counts.items())
+
+    def random_card(self) -> str:
+        """Pick a random owned card, weighted by how many copies there are."""
+        card_id = random.choices(list(self.counts), weights=list(self.counts.values()))[0]
+        return catalog.name_of(card_id)
+
+    def __len__(self) -> int:
+        return self.total
+
+def get_inventory(user_id: str) -> Inventory:
+    """Return user_id's inventory, or an empty one if they have never owned a card."""
+    inventory = player_cards.get(user_id)
+    return inventory if inventory is not None else Inventory()
+
+def inventories_from_json(data: dict) -> dict:
+    """Convert player_cards.json data (user ID -> list of card names) to inventories."""
+    return {str(user_id): Inventory.from_card_list(card_names) for user_id, card_names in data.items()}
+
+def inventories_to_json(inventories: dict) -> dict:
+    return {user_id: inventory.to_card_list() for user_id, inventory in inventories.items()}
+
+def apply_inventory_ops(inventories: dict, ops: list) -> list:
+    """Apply ("add"|"remove", user_id, card_name) ops to a user ID -> Inventory dict.
+
+    Returns the ops that actually changed something, leaving out removals of cards
+    the user didn't have.
+    """
+    applied = []
+    for op, user_id, card_name in ops:
+        if op == "add":
+            inventories.setdefault(user_id, Inventory()).add(card_name)
+            applied.append((op, user_id, card_name))
+        elif op == "remove":
+            if user_id not in inventories or not inventories[user_id].remove(card_name):
+                logging.warning(f"Inventory op removes {card_name} from {user_id}, who doesn't own it")
+            else:
+                applied.append((op, user_id, card_name))
+    return applied
+
+def record_inventory_ops(ops: list) -> asyncio.Future:
+    """Apply ops to player_cards and persist them as one entry/transaction.
+
+    Returns a future that resolves to True once the change is durably journaled, or
+    False if the append failed and a full snapshot was queued instead. Handlers can
+    await it without blocking other interactions.
+    """
+    global inventory_version
+    applied = apply_inventory_ops(player_cards, ops)
+    inventory_version += 1
+    for listener in inventory_listeners:
+        listener.apply(applied)
+    saved = asyncio.get_running_loop().create_future()
+
+    def on_appended(future):
+        if future.cancelled() or future.exception():
+            logging.error(f"Failed to record inventory change with the {storage.name} backend, rewriting the affected inventories instead")
+            storage.recover(player_cards, ops)
+            saved.set_result(False)
+        else:
+            saved.set_result(True)
+
+    storage.record(ops).add_done_callback(on_appended)
+    return saved
+
+def add_card_to_user(user_id: str, card_name: str) -> asyncio.Future:
+    return record_inventory_ops([("add", user_id, card_name)])
+
+def remove_card_from_user(user_id: str, card_name: str) -> asyncio.Future:
+    return record_inventory_ops([("remove", user_id, card_name)])
+
+class TransferError(Exception):
+    """A transfer_cards() move whose sender no longer has the card."""
+    def __init__(self, user_id: str, card_name: str):
+        super().__init__(f"{user_id} doesn't own {card_name}")
+        self.user_id = user_id
+        self.card_name = card_name
+
+async def transfer_cards(moves: list, expected_versions: dict = None, proceed=None) -> bool:
+    """Atomically move (sender_id, receiver_id, card_name) cards under the users' locks; a None sender mints the card.
+
+    Raises TransferError if a sender is short of a card, and returns False without moving anything if proceed() says no.
+    """
+    user_ids = {user_id for sender_id, receiver_id, _ in moves for user_id in (sender_id, receiver_id) if user_id}
+    async with user_locks.hold(*user_ids):
+        if expected_versions is None or any(get_inventory(user_id).version != version
+                                            for user_id, version in expected_versions.items()):
+            needed = Counter((sender_id, card_name) for sender_id, _, card_name in moves if sender_id)
+            for (sender_id, card_name), count in needed.items():
+                if get_inventory(sender_id).counts.get(catalog.card_id(card_name), 0) < count:
+                    raise TransferError(sender_id, card_name)
+        if proceed is not None and not proceed():
+            return False
+
+        ops = []
+        for sender_id, receiver_id, card_name in moves:
+            if sender_id:
+                ops.append(("remove", sender_id, card_name))
+            ops.append(("add", receiver_id, card_name))
+        await record_inventory_ops(ops)
+    return True
+
+# Card owners
+class CardOwnerIndex:
+    """Every card's owners and how many copies each has, for everyone including admins.
+
+    Kept up to date from inventory ops, so who owns a card is a dict lookup.
+    Owners are kept in the order they first got the card.
+    """
+    def __init__(self):
+        self.rebuild({})
+
+    def rebuild(self, inventories: dict) -> None:
+        self.owners = {}  # card ID -> {user ID: count}
+        self.copies = Counter()  # card ID -> copies owned by everyone
+        for user_id, inventory in inventories.items():
+            for card_id, count in inventory.counts.items():
+                self.owners.setdefault(card_id, {})[user_id] = count
+                self.copies[card_id] += count
+
+    def apply(self, ops: list) -> None:
+        touched = {(user_id, catalog.card_id(card_name)) for _, user_id, card_name in ops}
+        for user_id, card_id in touched:
+            if card_id is None:
+                continue
+            count = get_inventory(user_id).counts.get(card_id, 0)
+            card_owners = self.owners.setdefault(card_id, {})
+            self.copies[card_id] += count - card_owners.get(user_id, 0)
+            if count:
+                card_owners[user_id] = count
+            else:
+                card_owners.pop(user_id, None)
+
+    def owners_of(self, card_name: str) -> dict:
+        """{user ID: copies} for everyone who owns exactly card_name. Don't modify it."""
+        card_id = catalog.card_id(card_name)
+        return self.owners.get(card_id, {}) if card_id is not None else {}
+
+    def copies_of(self, card_name: str) -> int:
+        card_id = catalog.card_id(card_name)
+        return self.copies[card_id] if card_id is not None else 0
+
+    def find(self, name_or_alias: str):
+        """Return the owned card that is name_or_alias (ignoring case) or one of its aliases, or None."""
+        for card_id in catalog.candidate_ids(name_or_alias):
+            if self.copies[card_id]:
+                return catalog.name_of(card_id)
+        return None
+
+card_owners = CardOwnerIndex()
+inventory_listeners.append(card_owners)
+
+# Global card statistics
+class CardStatistics:
+    """Total users and cards over every inventory, updated per op instead of recounted."""
+    def __init__(self):
+        self.rebuild({})
+
+    def rebuild(self, inventories: dict) -> None:
+        self.total_users = len(inventories)
+        self.total_cards = sum(inventory.total for inventory in inventories.values())
+
+    def apply(self, ops: list) -> None:
+        self.total_cards += sum(1 if op == "add" else -1 for op, _, _ in ops)
+        self.total_users = len(player_cards)
+
+card_stats = CardStatistics()
+inventory_listeners.append(card_stats)
+
+# Leaderboards
+class LeaderboardIndex:
+    """Leaderboard state kept up to date as inventories change, so reading a top K is O(K).
+
+    Authorized users are left out, like on the leaderboards themselves. Totals and
+    unique counts live in sorted lists of (-count, user_id), and global card counts
+    in a sorted list of (-count, card_id). Card owners come from card_owners, which
+    has to be listed before this in inventory_listeners.
+    """
+    def __init__(self):
+        self.rebuild({})
+
+    @staticmethod
+    def _tracked(user_id) -> bool:
+        return user_id not in authorized_user_ids
+
+    @staticmethod
+    def _regular_copies(card_id) -> int:
+        card_owner_counts = card_owners.owners.get(card_id, {})
+        return card_owners.copies[card_id] - sum(card_owner_counts.get(user_id, 0) for user_id in authorized_user_ids)
+
+    def rebuild(self, inventories: dict) -> None:
+        self._user_keys = {user_id: (inventory.total, inventory.unique_count)
+                           for user_id, inventory in inventories.items() if self._tracked(user_id)}
+        self.card_counts = Counter()
+        for card_id in card_owners.owners:
+            count = self._regular_copies(card_id)
+            if count:
+                self.card_counts[card_id] = count
+        self.by_total = sorted((-total, user_id) for user_id, (total, _) in self._user_keys.items())
+        self.by_unique = sorted((-unique, user_id) for user_id, (_, unique) in self._user_keys.items())
+        self.by_card_count = sorted((-count, card_id) for card_id, count in self.card_counts.items())
+        self.total_cards = sum(self.card_counts.values())
+
+    @staticmethod
+    def _move(sorted_list, old_key, new_key):
+        if old_key is not None:
+            del sorted_list[bisect.bisect_left(sorted_list, old_key)]
+        if new_key is not None:
+            bisect.insort(sorted_list, new_key)
+
+    def apply(self, ops: list) -> None:
+        """Bring the index up to date after ops were applied to player_cards."""
+        users = {user_id for _, user_id, _ in ops if self._tracked(user_id)}
+        card_ids = {catalog.card_id(card_name) for _, user_id, card_name in ops if user_id in users}
+        card_ids.discard(None)
+
+        for card_id in card_ids:
+            old = self.card_counts[card_id]
+            new = self._regular_copies(card_id)
+            if new != old:
+                self.card_counts[card_id] = new
+                self.total_cards += new - old
+                self._move(self.by_card_count, (-old, card_id) if old else None, (-new, card_id) if new else None)
+
+        for user_id in users:
+            inventory = get_inventory(user_id)
+            old = self._user_keys.get(user_id)
+            new = (inventory.total, inventory.unique_count)
+            self._user_keys[user_id] = new
+            self._move(self.by_total, (-old[0], user_id) if old else None, (-new[0], user_id))
+            self._move(self.by_unique, (-old[1], user_id) if old else None, (-new[1], user_id))
+
+    @property
+    def user_count(self) -> int:
+        return len(self._user_keys)
+
+    def top_total(self, k: int) -> list:
+        """[(user ID, total cards)] for the k biggest collections."""
+        return [(user_id, -total) for total, user_id in self.by_total[:k]]
+
+    def top_unique(self, k: int) -> list:
+        """[(user ID, unique cards)] for the k most complete collections."""
+        return [(user_id, -unique) for unique, user_id in self.by_unique[:k]]
+
+    def most_collected(self):
+        """(card name, copies) of the card with the most copies owned, or None."""
+        if not self.by_card_count:
+            return None
+        count, card_id = self.by_card_count[0]
+        return catalog.name_of(card_id), -count
+
+    def rarest_owned(self):
+        """(card name, rarity) of the rarest card a tracked user owns, or None."""
+        return rarest_with_copies(self.card_counts)
+
+    def owners_of(self, card_name: str) -> list:
+        return [user_id for user_id in card_owners.owners_of(card_name) if self._tracked(user_id)]
+
+leaderboard = LeaderboardIndex()
+inventory_listeners.append(leaderboard)
+
+def strip_journal_generation(data: dict) -> int:
+    """Remove the journal generation marker from loaded snapshot data and return it."""
+    return int(data.pop(JOURNAL_GENERATION_KEY, 0))
+
 def load_player_cards() -> None:
-    global player_cards
+    global player_cards, inventory_version
+    logging.info(f"Cards loaded: {len(cards)} cards")
+    player_cards = storage.load_player_cards()
+    inventory_version += 1
+    for listener in inventory_listeners:
+        listener.rebuild(player_cards)
+
+def load_player_cards_json() -> dict:
+    """Load player_cards.json into inventories and replay the journal on top of it."""
+    player_cards = {}
     try:
-        logging.info(f"Cards loaded: {len(cards)} cards")
         if os.path.exists('player_cards.json') and os.path.getsize('player_cards.json') > 0:
             with open('player_cards.json', 'r', encoding='utf-8') as f:
                 player_cards = json.load(f)
+            inventory_journal.generation = strip_journal_generation(player_cards)
             # Ensure all keys are strings
-            player_cards = {str(k): v for k, v in player_cards.items()}
-            logging.info("Player cards loaded successfully: %d users found", len(player_cards))
+            player_cards = inventories_from_json(player_cards)
+            replayed = inventory_journal.replay(player_cards)
+            logging.info("Player cards loaded successfully: %d users found, %d journal entries replayed", len(player_cards), replayed)
         else:
             # Create a new file if it doesn't exist or is empty
-            player_cards = {}
             logging.info("Player cards file is empty or doesn't exist. Creating a new file.")
-            save_player_cards()  # Save the empty dictionary to create the file
+            inventory_journal.replay(player_cards)
+            inventory_journal.compact(player_cards)  # Save the (replayed) dictionary to create the file
     except json.JSONDecodeError as e:
         logging.error(f"Error decoding JSON from player cards file: {e}")
-        recover_from_backup()
+        player_cards = recover_from_backup()
     except Exception as e:
         logging.error(f"Unexpected error loading player cards: {e}")
-        recover_from_backup()
+        player_cards = recover_from_backup()
+    return player_cards
 
-def save_player_cards() -> None:
+def save_player_cards(snapshot: dict, generation: int) -> bool:
+    """Write a player cards snapshot to disk. Blocking, only call this from the persistence worker."""
     max_retries = 3
+    snapshot = {**snapshot, JOURNAL_GENERATION_KEY: generation}
 
     for attempt in range(max_retries):
         try:
             temp_file = 'player_cards_temp.json'
             with open(temp_file, 'w') as f:
-                json.dump(player_cards, f, indent=4)
+                json.dump(snapshot, f, indent=4)
 
             shutil.move(temp_file, 'player_cards.json')
-            return
+            return True
         except PermissionError:
             if attempt < max_retries - 1:
                 logging.warning(f"Permission denied when saving player cards. Retry {attempt + 1}/{max_retries}...")
@@ -326,7 +1210,7 @@ def save_player_cards() -> None:
                 emergency_path = f'player_cards_emergency_{int(time.time())}.json'
                 try:
                     with open(emergency_path, 'w') as f:
-                        json.dump(player_cards, f, indent=4)
+                        json.dump(snapshot, f, indent=4)
                     logging.info(f"Created emergency backup at {emergency_path}")
                 except Exception as e:
                     logging.error(f"Failed to create emergency backup: {e}")
@@ -336,16 +1220,17 @@ def save_player_cards() -> None:
                 logging.critical("Disk space issue detected when saving player data!")
                 try:
                     with open('player_cards_minimal.json', 'w') as f:
-                        json.dump(player_cards, f)
+                        json.dump(snapshot, f)
                 except Exception as e2:
                     logging.error(f"Failed even minimal save: {e2}")
             time.sleep(1)
         except Exception as e:
             logging.error(f"Error saving player cards: {e}")
             break  # Exit on non-permission errors
+    return False
 
-def recover_from_backup():
-    global player_cards
+def recover_from_backup() -> dict:
+    player_cards = {}
     backup_files = [f for f in os.listdir(backup_folder) if f.startswith("player_cards_backup_")]
     if backup_files:
         latest_backup = max(backup_files)
@@ -354,17 +1239,31 @@ def recover_from_backup():
         try:
             with open(backup_path, 'r', encoding='utf-8') as f:
                 player_cards = json.load(f)
-            player_cards = {str(k): v for k, v in player_cards.items()}
+            strip_journal_generation(player_cards)
+            player_cards = inventories_from_json(player_cards)
+            # The journal only holds changes made since the last compaction, so replay it on top of the backup
+            inventory_journal.replay(player_cards)
             logging.info("Recovery successful")
-            save_player_cards()  # Save the recovered data back to the main file
+            inventory_journal.compact(player_cards)  # Save the recovered data back to the main file
         except Exception as backup_error:
             logging.error(f"Backup recovery failed: {backup_error}")
             player_cards = {}
     else:
         logging.error("No backups found. Starting with an empty dictionary.")
-        player_cards = {}
+    return player_cards
+
+def prune_backups(prefix: str) -> None:
+    backup_files = [f for f in os.listdir(backup_folder) if f.startswith(prefix)]
+    backup_files.sort(key=lambda f: os.path.getmtime(os.path.join(backup_folder, f)))
+
+    if len(backup_files) > MAX_BACKUPS:
+        for old_file in backup_files[:-MAX_BACKUPS]:
+            old_filepath = os.path.join(backup_folder, old_file)
+            os.remove(old_filepath)
+            logging.info(f"Removed old backup: {old_file}")
 
 def create_backup():
+    """Copy player_cards.json into the backup folder. Blocking, see backup_player_cards()."""
     try:
         if not os.path.exists(backup_folder):
             os.makedirs(backup_folder)
@@ -375,23 +1274,384 @@ def create_backup():
         backup_filepath = os.path.join(backup_folder, backup_filename)
         shutil.copy('player_cards.json', backup_filepath)
         logging.info(f"Created backup: {backup_filename} in {backup_filepath}")
+        prune_backups("player_cards_backup_")
+    except Exception as e:
+        logging.error(f"Failed to create backup: {e}")
+
+# Storage backends
+class JsonStorage:
+    """The original file formats: player_cards.json plus its journal, blacklist.json and stats.json."""
+    name = "json"
+
+    def __init__(self):
+        self._stats = ({}, {})  # Last saved user_stats and trade_stats, only touched by the persistence worker after loading
+
+    def load_player_cards(self) -> dict:
+        return load_player_cards_json()
+
+    def record(self, ops: list) -> asyncio.Future:
+        return inventory_journal.record(ops)
+
+    def checkpoint(self, inventory: dict) -> asyncio.Future:
+        return inventory_journal.compact(inventory)
+
+    def recover(self, inventory: dict, ops: list) -> asyncio.Future:
+        """Persist inventory after ops failed to record. The journal can't be trusted, so snapshot everything."""
+        return inventory_journal.compact(inventory)
+
+    def create_backup(self) -> None:
+        create_backup()
+
+    def count_backups(self) -> int:
+        return len([f for f in os.listdir(backup_folder) if f.startswith("player_cards_backup_")])
+
+    def load_blacklist(self) -> List[str]:
+        try:
+            with open(blacklist_file, "r") as f:
+                data = f.read().strip()
+                if not data:
+                    return []
+                return json.loads(data)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            logging.error(f"Error loading blacklist: {e}")
+            return []
+
+    def save_blacklist(self, blacklist: List[str]) -> None:
+        try:
+            with open(blacklist_file, "w") as f:
+                json.dump(blacklist, f)
+        except Exception as e:
+            logging.error(f"Error saving blacklist: {e}")
+
+    def blacklist_version(self):
+        try:
+            return os.stat(blacklist_file).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load_stats(self) -> tuple:
+        try:
+            with open(stats_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._stats = (data.get("user_stats", {}), data.get("trade_stats", {}))
+        except FileNotFoundError:
+            self._stats = ({}, {})
+        except json.JSONDecodeError as e:
+            logging.error(f"Error loading stats, starting from zero: {e}")
+            self._stats = ({}, {})
+        return {user_id: dict(stats) for user_id, stats in self._stats[0].items()}, dict(self._stats[1])
+
+    def save_stats(self, changed_users: dict, changed_cards: dict) -> None:
+        saved_users, saved_cards = self._stats
+        saved_users.update(changed_users)
+        saved_cards.update(changed_cards)
+        temp_file = stats_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({"user_stats": saved_users, "trade_stats": saved_cards}, f)
+        os.replace(temp_file, stats_file)
+
+class SQLiteStorage:
+    """SQLite (WAL mode) storage for inventories, stats and the blacklist.
+
+    Inventory and stat writes run on the persistence worker with their own
+    connection, each batch of ops as a single transaction. Reads and the rare
+    blacklist writes use a second connection on the event loop thread.
+    On first start an empty database is filled from player_cards.json (plus
+    journal) and blacklist.json.
+    """
+    name = "sqlite"
+    user_stat_columns = ('battles_fought', 'battles_won', 'trades_completed', 'cards_caught')
+    schema = """
+        CREATE TABLE IF NOT EXISTS owned_cards (
+            user_id TEXT NOT NULL,
+            card_name TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, card_name)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_owned_cards_card ON owned_cards (card_name, user_id);
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id TEXT PRIMARY KEY,
+            battles_fought INTEGER NOT NULL DEFAULT 0,
+            battles_won INTEGER NOT NULL DEFAULT 0,
+            trades_completed INTEGER NOT NULL DEFAULT 0,
+            cards_caught INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS trade_stats (
+            card_name TEXT PRIMARY KEY,
+            trades INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS blacklist (
+            user_id TEXT PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS blacklist_insert AFTER INSERT ON blacklist BEGIN
+            INSERT INTO meta VALUES ('blacklist_version', '1')
+            ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS blacklist_delete AFTER DELETE ON blacklist BEGIN
+            INSERT INTO meta VALUES ('blacklist_version', '1')
+            ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS blacklist_update AFTER UPDATE ON blacklist BEGIN
+            INSERT INTO meta VALUES ('blacklist_version', '1')
+            ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1;
+        END;
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._reader = self._connect()
+        self._reader.executescript(self.schema)
+        self._writer = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")  # NORMAL skips the fsync on commit in WAL mode, and record() promises durability
+        return conn
+
+    def _writer_connection(self) -> sqlite3.Connection:
+        # Only ever called on the persistence worker thread
+        if self._writer is None:
+            self._writer = self._connect()
+        return self._writer
+
+    def _submit(self, statements) -> asyncio.Future:
+        def run():
+            conn = self._writer_connection()
+            with conn:
+                statements(conn)
+        return persistence_worker.submit(run)
+
+    def migrate_from_json(self) -> None:
+        """One-shot import of the JSON files into an empty database."""
+        if self._reader.execute("SELECT 1 FROM meta WHERE key = 'migrated_from_json'").fetchone():
+            return
+        inventory = load_player_cards_json()
+        blacklist = JsonStorage().load_blacklist()
+        rows = [(user_id, card_name, count)
+                for user_id, user_inventory in inventory.items()
+                for card_name, count in user_inventory.items()]
+        with self._reader:
+            self._reader.executemany("INSERT OR IGNORE INTO users VALUES (?)", [(user_id,) for user_id in inventory])
+            self._reader.executemany("INSERT OR REPLACE INTO owned_cards VALUES (?, ?, ?)", rows)
+            self._reader.executemany("INSERT OR IGNORE INTO blacklist VALUES (?)", [(user_id,) for user_id in blacklist])
+            self._reader.execute("INSERT INTO meta VALUES ('migrated_from_json', ?)", (datetime.datetime.now().isoformat(),))
+        logging.info(f"Migrated {len(inventory)} users and {len(blacklist)} blacklisted IDs from JSON into {self.path}")
+
+    def load_player_cards(self) -> dict:
+        self.migrate_from_json()
+        with self._reader:
+            # Databases from before the users table only know users through their cards
+            self._reader.execute("INSERT OR IGNORE INTO users SELECT DISTINCT user_id FROM owned_cards")
+        # Users whose inventory is empty stay users, like they do in player_cards.json
+        player_cards = {row[0]: Inventory() for row in self._reader.execute("SELECT user_id FROM users")}
+        for user_id, card_name, count in self._reader.execute("SELECT user_id, card_name, count FROM owned_cards"):
+            player_cards.setdefault(user_id, Inventory()).add(card_name, count)
+        logging.info("Player cards loaded from %s: %d users found", self.path, len(player_cards))
+        return player_cards
+
+    @staticmethod
+    def _apply_ops(conn: sqlite3.Connection, ops: list) -> None:
+        for op, user_id, card_name in ops:
+            if op == "add":
+                conn.execute("INSERT OR IGNORE INTO users VALUES (?)", (user_id,))
+                conn.execute(
+                    "INSERT INTO owned_cards VALUES (?, ?, 1) "
+                    "ON CONFLICT (user_id, card_name) DO UPDATE SET count = count + 1",
+                    (user_id, card_name)
+                )
+            elif op == "remove":
+                deleted = conn.execute(
+                    "DELETE FROM owned_cards WHERE user_id = ? AND card_name = ? AND count <= 1",
+                    (user_id, card_name)
+                ).rowcount
+                if not deleted:
+                    conn.execute(
+                        "UPDATE owned_cards SET count = count - 1 WHERE user_id = ? AND card_name = ?",
+                        (user_id, card_name)
+                    )
+
+    def record(self, ops: list) -> asyncio.Future:
+        return self._submit(lambda conn: self._apply_ops(conn, ops))
+
+    def checkpoint(self, inventory: dict) -> asyncio.Future:
+        # Every change is already committed, only fold the WAL back into the main file
+        return persistence_worker.submit(
+            lambda: self._writer_connection().execute("PRAGMA wal_checkpoint(TRUNCATE)"),
+            coalesce_key="sqlite_checkpoint"
+        )
 
-        backup_files = [f for f in os.listdir(backup_folder) if f.startswith("player_cards_backup_")]
-        backup_files.sort(key=lambda f: os.path.getmtime(os.path.join(backup_folder, f)))
+    def recover(self, inventory: dict, ops: list) -> asyncio.Future:
+        """Persist inventory after ops failed to record by rewriting every affected user's rows.
 
-        if len(backup_files) > MAX_BACKUPS:
-            for old_file in backup_files[:-MAX_BACKUPS]:
-                old_filepath = os.path.join(backup_folder, old_file)
-                os.remove(old_filepath)
-                logging.info(f"Removed old backup: {old_file}")
+        The rows are copied here on the event loop, so they match memory even if more
+        changes come in before the worker gets to them.
+        """
+        user_ids = {user_id for _, user_id, _ in ops}
+        rows = [(user_id, card_name, count)
+                for user_id in user_ids if user_id in inventory
+                for card_name, count in inventory[user_id].items() if count]
+
+        def rewrite(conn):
+            conn.executemany("INSERT OR IGNORE INTO users VALUES (?)", [(user_id,) for user_id in user_ids if user_id in inventory])
+            conn.executemany("DELETE FROM owned_cards WHERE user_id = ?", [(user_id,) for user_id in user_ids])
+            conn.executemany("INSERT INTO owned_cards VALUES (?, ?, ?)", rows)
+        return self._submit(rewrite)
+
+    def create_backup(self) -> None:
+        try:
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_filename = f"dex_backup_{timestamp}.db"
+            backup_filepath = os.path.join(backup_folder, backup_filename)
+            with sqlite3.connect(backup_filepath) as target:
+                self._writer_connection().backup(target)
+            target.close()
+            logging.info(f"Created backup: {backup_filename} in {backup_filepath}")
+            prune_backups("dex_backup_")
+        except Exception as e:
+            logging.error(f"Failed to create backup: {e}")
+
+    def count_backups(self) -> int:
+        return len([f for f in os.listdir(backup_folder) if f.startswith("dex_backup_")])
+
+    def load_blacklist(self) -> List[str]:
+        return [row[0] for row in self._reader.execute("SELECT user_id FROM blacklist")]
+
+    def save_blacklist(self, blacklist: List[str]) -> None:
+        try:
+            with self._reader:
+                self._reader.execute("DELETE FROM blacklist")
+                self._reader.executemany("INSERT INTO blacklist VALUES (?)", [(user_id,) for user_id in blacklist])
+        except sqlite3.Error as e:
+            logging.error(f"Error saving blacklist: {e}")
+
+    def blacklist_version(self):
+        # Bumped by the blacklist triggers, so writes to other tables don't count as blacklist changes
+        row = self._reader.execute("SELECT value FROM meta WHERE key = 'blacklist_version'").fetchone()
+        return row[0] if row else None
+
+    def load_stats(self) -> tuple:
+        user_stats = {}
+        columns = ", ".join(self.user_stat_columns)
+        for row in self._reader.execute(f"SELECT user_id, {columns} FROM user_stats"):
+            user_stats[row[0]] = dict(zip(self.user_stat_columns, row[1:]))
+        trade_stats = dict(self._reader.execute("SELECT card_name, trades FROM trade_stats").fetchall())
+        return user_stats, trade_stats
+
+    def save_stats(self, changed_users: dict, changed_cards: dict) -> None:
+        columns = ", ".join(self.user_stat_columns)
+        placeholders = ", ".join("?" * len(self.user_stat_columns))
+        updates = ", ".join(f"{column} = excluded.{column}" for column in self.user_stat_columns)
+        conn = self._writer_connection()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO user_stats (user_id, {columns}) VALUES (?, {placeholders}) "
+                f"ON CONFLICT (user_id) DO UPDATE SET {updates}",
+                [(user_id, *(stats.get(column, 0) for column in self.user_stat_columns))
+                 for user_id, stats in changed_users.items()]
+            )
+            conn.executemany(
+                "INSERT INTO trade_stats VALUES (?, ?) "
+                "ON CONFLICT (card_name) DO UPDATE SET trades = excluded.trades",
+                list(changed_cards.items())
+            )
+
+def create_storage():
+    if storage_backend == "sqlite":
+        return SQLiteStorage(database_file)
+    if storage_backend != "json":
+        logging.warning(f"Unknown STORAGE_BACKEND '{storage_backend}', falling back to json")
+    return JsonStorage()
+
+storage = create_storage()
+
+def load_stats() -> None:
+    global user_stats, trade_stats
+    user_stats, trade_stats = storage.load_stats()
+
+# Stats checkpointing
+class StatsCheckpointer:
+    """Tracks which user_stats and trade_stats entries changed since they were last saved.
+
+    Counting a stat only updates memory and marks the entry dirty. checkpoint() saves
+    every dirty entry's current value in one storage write on the persistence worker,
+    so a busy minute costs one write instead of one per catch, trade and battle.
+    """
+    def __init__(self):
+        self.dirty_users = set()
+        self.dirty_cards = set()
+
+    def checkpoint(self) -> asyncio.Future:
+        changed_users = {user_id: dict(user_stats[user_id]) for user_id in self.dirty_users if user_id in user_stats}
+        changed_cards = {card_name: trade_stats[card_name] for card_name in self.dirty_cards if card_name in trade_stats}
+        self.dirty_users, self.dirty_cards = set(), set()
+        if not changed_users and not changed_cards:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(None)
+            return future
+
+        def mark_dirty_again(future):
+            # Values are saved whole, so retrying on the next checkpoint can't count anything twice
+            if future.cancelled() or future.exception():
+                self.dirty_users.update(changed_users)
+                self.dirty_cards.update(changed_cards)
+        future = persistence_worker.submit(lambda: storage.save_stats(changed_users, changed_cards))
+        future.add_done_callback(mark_dirty_again)
+        return future
+
+stats_checkpointer = StatsCheckpointer()
+
+@tasks.loop(seconds=STATS_CHECKPOINT_SECONDS)
+async def checkpoint_stats():
+    try:
+        await stats_checkpointer.checkpoint()
     except Exception as e:
-        logging.error(f"Failed to create backup: {e}")
+        logging.error(f"Stats checkpoint failed, retrying next time: {e}")
+    try:
+        await activity_log.checkpoint()
+    except Exception as e:
+        logging.error(f"Activity log checkpoint failed: {e}")
+
+async def backup_player_cards():
+    """Checkpoint storage so it is current, then back it up off the event loop.
+
+    Also the shutdown path, so each checkpoint is tried even if an earlier one fails.
+    """
+    try:
+        await storage.checkpoint(player_cards)
+    except Exception as e:
+        logging.error(f"Checkpoint before backup failed, backing up the last good state: {e}")
+    try:
+        await stats_checkpointer.checkpoint()
+    except Exception as e:
+        logging.error(f"Stats checkpoint failed: {e}")
+    try:
+        await activity_log.checkpoint()
+    except Exception as e:
+        logging.error(f"Activity log checkpoint failed: {e}")
+    await persistence_worker.submit(storage.create_backup)
+
+@tasks.loop(minutes=5)
+async def compact_inventory_journal():
+    if storage.name != "json" or inventory_journal.entries < JOURNAL_COMPACT_THRESHOLD:
+        return
+    try:
+        await inventory_journal.compact(player_cards)
+    except Exception as e:
+        logging.error(f"Journal compaction failed: {e}", exc_info=True)
 
 @tasks.loop(hours=8)
 async def backup_player_data():
     logging.info("Running scheduled backup of player data")
     try:
-        create_backup()
+        await backup_player_cards()
         logging.info("Backup completed successfully")
     except Exception as e:
         logging.error(f"Backup failed: {e}", exc_info=True)
@@ -402,10 +1662,9 @@ async def card_name_autocomplete(
 ) -> list[app_commands.Choice[str]]:
     """Autocomplete for cards the user owns, filtered by input."""
     user_id = str(interaction.user.id)
-    user_cards = player_cards.get(user_id, [])
-    # Remove duplicates and filter by current input
+    # Filter the user's unique cards by current input
     filtered = [
-        card for card in set(user_cards)
+        card for card in get_inventory(user_id).unique()
         if current.lower() in card.lower()
     ]
     # Limit to 25 choices (Discord API limit)
@@ -428,47 +1687,35 @@ class CatchModal(Modal):
         self.add_item(self.card_input)
 
     async def on_submit(self, interaction: discord.Interaction):
-        global submit_lock
         user = interaction.user
         user_id = str(user.id)
 
-        # Attempt to acquire the lock with a timeout of 5 seconds
-        try:
-            acquired = await asyncio.wait_for(submit_lock.acquire(), timeout=5.0)
-            if not acquired:
-                await interaction.response.send_message("Unable to process your request. Please try again.", ephemeral=True)
-                return
-        except asyncio.TimeoutError:
-            await interaction.response.send_message("The system is busy. Please try again in a moment.", ephemeral=True)
+        if self.view.card_claimed:
+            await interaction.response.send_message("The card has already been claimed.", ephemeral=True)
             return
-        
-        # Use try-finally to ensure lock is released even if an error occurs
-        try:
-            if self.view.card_claimed:
-                await interaction.response.send_message("The card has already been claimed.", ephemeral=True)
-                return
 
-            input_name = self.card_input.value.lower()
-            if input_name == self.card_name.lower() or input_name in [alias.lower() for alias in next(card['aliases'] for card in cards if card['name'].lower() == self.card_name.lower())]:
-                user_id = str(user.id)
-                user_cards = player_cards.setdefault(user_id, [])
-                is_new_card = self.card_name not in user_cards
-                user_cards.append(self.card_name)
-                save_player_cards()
-                update_user_stats(user_id, 'cards_caught')
-                message = f"{user.mention} caught the card: {self.card_name}!"
-                if is_new_card:
-                    message += "\nThis is the first time you catched this card! It will make a fine addition to your collection..."
-                await interaction.response.send_message(message, ephemeral=False)
-                self.view.card_claimed = True
-                for item in self.view.children:
-                    if isinstance(item, Button):
-                        item.disabled = True
-                await self.message.edit(view=self.view)
-            else:
-                await interaction.response.send_message(f"{user.mention}; Incorrect name.", ephemeral=False)
-        finally:
-            submit_lock.release()
+        if not catalog.matches(self.card_name, self.card_input.value):
+            await interaction.response.send_message(f"{user.mention}; Incorrect name.", ephemeral=False)
+            return
+
+        # Only the first correct answer gets past this, whatever else is in flight
+        if not self.view.claim():
+            await interaction.response.send_message("The card has already been claimed.", ephemeral=True)
+            return
+
+        async with user_locks.hold(user_id):
+            is_new_card = get_inventory(user_id).count(self.card_name) == 0
+            await add_card_to_user(user_id, self.card_name)
+        update_user_stats(user_id, 'cards_caught')
+        activity_log.emit("catch", interaction.channel_id, user_id, card_name=self.card_name)
+        message = f"{user.mention} caught the card: {self.card_name}!"
+        if is_new_card:
+            message += "\nThis is the first time you catched this card! It will make a fine addition to your collection..."
+        await interaction.response.send_message(message, ephemeral=False)
+        for item in self.view.children:
+            if isinstance(item, Button):
+                item.disabled = True
+        await self.message.edit(view=self.view)
 
 class CatchButton(Button):
     def __init__(self, card_name):
@@ -495,20 +1742,26 @@ class CatchView(View):
         self.card_claimed = False
         self.add_item(CatchButton(card_name))
 
+    def claim(self) -> bool:
+        """Mark the card as caught, returning False if someone already caught it. No await, so no race."""
+        if self.card_claimed:
+            return False
+        self.card_claimed = True
+        return True
+
 # Progress View UI
 class ProgressView(View):
-    def __init__(self, user_cards, missing_cards, user, display_name_override=None):
+    def __init__(self, inventory, missing_cards, user, display_name_override=None):
         super().__init__(timeout=None)
-        self.user_cards = user_cards  
-        self.unique_user_cards = list(set(user_cards))
+        self.card_counts = dict(inventory.items())
         self.missing_cards = missing_cards
         self.user = user
         self.display_name_override = display_name_override  # NEW
         self.current_page = 0
         self.viewing_owned = True
 
-        card_counts = Counter(self.user_cards)
-        self.rarity_zero_cards = [card for card in card_counts if next((c for c in cards if c['name'] == card), {}).get('rarity', 100) == 0]
+        card_counts = self.card_counts
+        self.rarity_zero_cards = [card for card in card_counts if catalog.rarity(card) == 0]
         self.other_cards = [card for card in card_counts if card not in self.rarity_zero_cards]
 
         self.owned_pages = max(1, (len(self.other_cards) + 9) // 10)
@@ -616,10 +1869,10 @@ class ProgressView(View):
             owner_text = "your"
         embed = discord.Embed(
             title="📚 Card Collection Progress",
-            description=f"Showing {owner_text} owned unique cards ({len(set(self.unique_user_cards))}/{len(set(self.unique_user_cards)) + len(self.missing_cards)} unique cards collected)",
+            description=f"Showing {owner_text} owned unique cards ({len(self.card_counts)}/{len(self.card_counts) + len(self.missing_cards)} unique cards collected)",
             color=discord.Color.green()
         )
-        card_counts = Counter(self.user_cards)
+        card_counts = self.card_counts
         start = self.current_page * 10
         end = min(start + 10, len(self.other_cards))
 
@@ -695,6 +1948,7 @@ class TradeSession:
     def reset_activity_timer(self):
         """Reset the activity timer whenever a user performs an action"""
         self.last_activity = time.time()
+        session_deadlines.reschedule(self, self.timeout)
 
     async def start_trade(self):
         embed = discord.Embed(
@@ -708,21 +1962,17 @@ class TradeSession:
         view = TradeInviteView(self)
         self.trade_message = await self.ctx.send(embed=embed, view=view)
 
-        asyncio.create_task(self.monitor_timeout())
+        session_deadlines.schedule(self, self.timeout, self.expire)
 
-    async def monitor_timeout(self):
-        """Monitor for inactivity timeout"""
-        while self.active:
-            await asyncio.sleep(10)
-            if time.time() - self.last_activity > self.timeout:
-                await self.cancel_trade("Trade expired due to inactivity.")
+    async def expire(self):
+        """Called by session_deadlines after timeout seconds of inactivity"""
+        await self.cancel_trade("Trade expired due to inactivity.")
 
-                if hasattr(bot, 'active_trades'):
-                    if self.initiator_id in bot.active_trades:
-                        del bot.active_trades[self.initiator_id]
-                    if self.recipient_id in bot.active_trades:
-                        del bot.active_trades[self.recipient_id]
-                return
+        if hasattr(bot, 'active_trades'):
+            if self.initiator_id in bot.active_trades:
+                del bot.active_trades[self.initiator_id]
+            if self.recipient_id in bot.active_trades:
+                del bot.active_trades[self.recipient_id]
 
     async def update_trade_status(self):
         """Update the trade status embed"""
@@ -730,7 +1980,7 @@ class TradeSession:
             return
         
         def format_card_with_rarity(card_name):
-            card_data = next((c for c in cards if c['name'] == card_name), None)
+            card_data = catalog.get(card_name)
             if not card_data:
                 return card_name
             rarity = card_data.get('rarity', 100)
@@ -782,91 +2032,108 @@ class TradeSession:
 
     async def finalize_trade(self):
         """Complete the trade by exchanging cards"""
-        async with trade_lock:
-            for card in self.initiator_cards:
-                if not user_has_card(self.initiator_id, card):
-                    await self.cancel_trade(f"{self.initiator.mention} no longer has the card `{card}`.")
-                    return
+        reason = self.missing_card_reason()
+        if reason:
+            await self.cancel_trade(reason)
+            return
+        expected_versions = {user_id: get_inventory(user_id).version
+                             for user_id in (self.initiator_id, self.recipient_id)}
 
-            for card in self.recipient_cards:
-                if not user_has_card(self.recipient_id, card):
-                    await self.cancel_trade(f"{self.recipient.mention} no longer has the card `{card}`.")
+        embed = discord.Embed(
+            title="🔍 Final Trade Confirmation",
+            description=f"Please review this trade one last time:",
+            color=discord.Color.gold()
+        )
+
+        embed.add_field(
+            name=f"{self.initiator.display_name} will give:",
+            value=", ".join(self.initiator_cards) if self.initiator_cards else "Nothing",
+            inline=True
+        )
+
+        embed.add_field(
+            name=f"{self.recipient.display_name} will give:",
+            value=", ".join(self.recipient_cards) if self.recipient_cards else "Nothing",
+            inline=True
+        )
+
+        embed.set_footer(text="Trade will complete in 20 seconds. Type /trade cancel to stop.")
+
+        await self.ctx.send(embed=embed)
+
+        self.finalization_time = time.time()
+        await asyncio.sleep(20)  # Allow 20 seconds for final confirmation
+
+        if not self.active:
+            return
+
+        try:
+            # Only the swap itself locks the two users, never the wait above
+            moves = ([(self.initiator_id, self.recipient_id, card) for card in self.initiator_cards] +
+                     [(self.recipient_id, self.initiator_id, card) for card in self.recipient_cards])
+            try:
+                # A cancel or expiry while waiting for the locks wins, otherwise the trade is closed before anything moves
+                if not await transfer_cards(moves, expected_versions, proceed=self._close):
                     return
-            
+            except TransferError as e:
+                user = self.initiator if e.user_id == self.initiator_id else self.recipient
+                await self.cancel_trade(f"{user.mention} no longer has the card `{e.card_name}`.")
+                return
+
+            for card in self.initiator_cards + self.recipient_cards:
+                update_trade_stats(card)
+            update_user_stats(self.initiator_id, 'trades_completed')
+            update_user_stats(self.recipient_id, 'trades_completed')
+            activity_log.emit("trade", self.ctx.channel_id, self.initiator_id, self.recipient_id, value=len(moves))
+
             embed = discord.Embed(
-                title="🔍 Final Trade Confirmation",
-                description=f"Please review this trade one last time:",
-                color=discord.Color.gold()
+                title="🎉 Trade Completed!",
+                description="Cards have been successfully exchanged.",
+                color=discord.Color.green()
             )
-
+            
+            initiator_summary = "None" if not self.initiator_cards else ", ".join(self.initiator_cards)
+            recipient_summary = "None" if not self.recipient_cards else ", ".join(self.recipient_cards)
+            
             embed.add_field(
-                name=f"{self.initiator.display_name} will give:",
-                value=", ".join(self.initiator_cards) if self.initiator_cards else "Nothing",
+                name=f"{self.initiator.display_name} gave:",
+                value=initiator_summary,
                 inline=True
             )
-
             embed.add_field(
-                name=f"{self.recipient.display_name} will give:",
-                value=", ".join(self.recipient_cards) if self.recipient_cards else "Nothing",
+                name=f"{self.recipient.display_name} gave:",
+                value=recipient_summary,
                 inline=True
             )
-
-            embed.set_footer(text="Trade will complete in 20 seconds. Type /trade cancel to stop.")
-
+            
             await self.ctx.send(embed=embed)
+            
+            logging.info(f"Trade completed between {self.initiator.name} and {self.recipient.name}")
 
-            self.finalization_time = time.time()
-            await asyncio.sleep(20)  # Allow 20 seconds for final confirmation
-
-            if not self.active:
-                return
+        except Exception as e:
+            logging.error(f"Error during trade finalization: {e}", exc_info=True)
+            await self.ctx.send("An error occurred during the trade. Please try again later.")
+            self.active = False
+            session_deadlines.cancel(self)
 
-            try:
-                for card in self.initiator_cards:
-                    player_cards[self.initiator_id].remove(card)
-                    player_cards.setdefault(self.recipient_id, []).append(card)
-                    update_trade_stats(card)
-
-                for card in self.recipient_cards:
-                    player_cards[self.recipient_id].remove(card)
-                    player_cards.setdefault(self.initiator_id, []).append(card)
-                    update_trade_stats(card)
-                
-                update_user_stats(self.initiator_id, 'trades_completed')
-                update_user_stats(self.recipient_id, 'trades_completed')
+    def _close(self) -> bool:
+        """Mark the trade finished unless it was already cancelled, returning whether it was still open."""
+        if not self.active:
+            return False
+        self.active = False
+        session_deadlines.cancel(self)
+        return True
 
-                save_player_cards()
+    def missing_card_reason(self):
+        """Return why the trade can't go through if either side no longer has a card they offered."""
+        for card in self.initiator_cards:
+            if not user_has_card(self.initiator_id, card):
+                return f"{self.initiator.mention} no longer has the card `{card}`."
 
-                embed = discord.Embed(
-                    title="🎉 Trade Completed!",
-                    description="Cards have been successfully exchanged.",
-                    color=discord.Color.green()
-                )
-                
-                initiator_summary = "None" if not self.initiator_cards else ", ".join(self.initiator_cards)
-                recipient_summary = "None" if not self.recipient_cards else ", ".join(self.recipient_cards)
-                
-                embed.add_field(
-                    name=f"{self.initiator.display_name} gave:",
-                    value=initiator_summary,
-                    inline=True
-                )
-                embed.add_field(
-                    name=f"{self.recipient.display_name} gave:",
-                    value=recipient_summary,
-                    inline=True
-                )
-                
-                await self.ctx.send(embed=embed)
-                
-                logging.info(f"Trade completed between {self.initiator.name} and {self.recipient.name}")
-
-                self.active = False
-                
-            except Exception as e:
-                logging.error(f"Error during trade finalization: {e}", exc_info=True)
-                await self.ctx.send("An error occurred during the trade. Please try again later.")
-                self.active = False
+        for card in self.recipient_cards:
+            if not user_has_card(self.recipient_id, card):
+                return f"{self.recipient.mention} no longer has the card `{card}`."
+        return None
 
     async def cancel_trade(self, reason="Trade cancelled."):
         """Cancel the trade"""
@@ -874,6 +2141,7 @@ class TradeSession:
             return
             
         self.active = False
+        session_deadlines.cancel(self)
         embed = discord.Embed(
             title="❌ Trade Cancelled",
             description=reason,
@@ -959,6 +2227,99 @@ class DeclineConfirmView(View):
         self.stop()
 
 # Battle System UI
+class ChannelEditBudget:
+    """Token bucket for message edits in one channel, shared by every battle shown there.
+
+    Discord lets a channel take about 5 edits per 5 seconds before answering with
+    429s. An edit that comes back slowly was most likely held back by discord.py
+    for a rate limit, so that empties the bucket too.
+    """
+    def __init__(self, capacity=5, per=5.0):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token, returning how many seconds to wait before the edit can go out."""
+        self._refill()
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def release(self):
+        """Give back a reserved token that won't be used."""
+        self.tokens += 1
+
+    def throttled(self):
+        """Note that Discord rate limited an edit in this channel."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+def edit_budget_for(channel_id) -> ChannelEditBudget:
+    return channel_edit_budgets.setdefault(channel_id, ChannelEditBudget())
+
+class BattleRenderer:
+    """Edits a battle's status message, folding several turns into each edit.
+
+    Frames go out at most every FRAME_INTERVAL seconds and there are about
+    MAX_FRAMES per battle, so long fights show more turns per edit. Every time
+    the channel's edit budget makes a frame wait, twice as many turns go into
+    the following frames. Once a frame would wait longer than SATURATED_WAIT
+    the renderer gives up on the rest, and the battle skips to its result.
+    """
+    FRAME_INTERVAL = 2.0
+    MAX_FRAMES = 15
+    SATURATED_WAIT = 10.0
+    SLOW_EDIT = 1.0
+
+    def __init__(self, message, total_turns):
+        self.message = message
+        self.budget = edit_budget_for(message.channel.id)
+        self.total_turns = total_turns
+        self.turns_per_frame = max(1, math.ceil(total_turns / self.MAX_FRAMES))
+        self.last_frame_turn = 0
+        self.next_frame_at = time.monotonic() + self.FRAME_INTERVAL
+        self.saturated = False
+        self.edits = 0
+
+    def wants_frame(self, turn_number) -> bool:
+        """Whether the state after turn_number should be shown."""
+        if self.saturated:
+            return False
+        return turn_number == self.total_turns or turn_number - self.last_frame_turn >= self.turns_per_frame
+
+    async def show(self, turn_number, embed) -> bool:
+        """Edit the message to show embed, returning False if the channel is saturated."""
+        wait = self.budget.reserve()
+        if wait > self.SATURATED_WAIT:
+            self.budget.release()
+            self.saturated = True
+            logging.info(f"Channel {self.message.channel.id} is saturated with edits, skipping to the battle result")
+            return False
+        if wait > 0:
+            self.turns_per_frame *= 2
+        await asyncio.sleep(max(wait, self.next_frame_at - time.monotonic()))
+
+        started = time.monotonic()
+        try:
+            await self.message.edit(embed=embed)
+        except discord.HTTPException as e:
+            if e.status != 429:
+                raise
+            self.budget.throttled()
+            self.turns_per_frame *= 2
+        if time.monotonic() - started > self.SLOW_EDIT:
+            self.budget.throttled()
+        self.edits += 1
+        self.last_frame_turn = turn_number
+        self.next_frame_at = time.monotonic() + self.FRAME_INTERVAL
+        return True
+
 class CardBattle:
     def __init__(self, ctx, challenger, opponent):
         self.ctx = ctx
@@ -970,6 +2331,7 @@ class CardBattle:
         self.opponent_cards = []
         self.challenger_selected = False
         self.opponent_selected = False
+        self.selection_done = asyncio.Event()
         self.battle_message = None
         self.timeout = 120
         self.last_activity = time.time()
@@ -987,6 +2349,7 @@ class CardBattle:
     def reset_activity_timer(self):
         """Reset the activity timer whenever a user performs an action"""
         self.last_activity = time.time()
+        session_deadlines.reschedule(self, self.timeout)
 
     async def start_battle(self):
         embed = discord.Embed(
@@ -1023,19 +2386,37 @@ class CardBattle:
             # This should not happen due to the wait_for_selection, but just in case
             await self.send_message("Battle cancelled.")
     
+    def submit_selection(self, player_type, selected_cards):
+        """Store a player's cards, waking wait_for_selection once both sides are in"""
+        if player_type == "challenger":
+            self.challenger_cards = selected_cards
+            self.challenger_selected = True
+        else:
+            self.opponent_cards = selected_cards
+            self.opponent_selected = True
+        if self.challenger_selected and self.opponent_selected:
+            self.selection_done.set()
+
     async def wait_for_selection(self):
         """Wait until both players have selected their cards or timeout occurs"""
-        while not (self.challenger_selected and self.opponent_selected):
-            # Check if we've exceeded timeout since last activity
-            if time.time() - self.last_activity > self.timeout:
-                return False  # Timed out
-            await asyncio.sleep(1)
-        return True  # Both players selected cards
+        timed_out = False
+
+        def expire():
+            nonlocal timed_out
+            timed_out = True
+            self.selection_done.set()
+
+        session_deadlines.schedule(self, self.timeout, expire)
+        try:
+            await self.selection_done.wait()
+        finally:
+            session_deadlines.cancel(self)
+        return not timed_out  # Both players selected cards
 
     async def execute_battle(self):
         # Initialize battle state
-        challenger_battle_cards = [self._copy_card_for_battle(card) for card in self.challenger_cards]
-        opponent_battle_cards = [self._copy_card_for_battle(card) for card in self.opponent_cards]
+        challenger_battle_cards = [battle_stats(card) for card in self.challenger_cards]
+        opponent_battle_cards = [battle_stats(card) for card in self.opponent_cards]
 
         # Battle announcement
         embed = discord.Embed(
@@ -1055,78 +2436,37 @@ class CardBattle:
         
         battle_log = await self.ctx.send(embed=embed)
 
-        # Battle loop
-        turn = 0
+        # The whole fight is resolved up front, the loop below only shows it
+        result = simulate_battle(challenger_battle_cards, opponent_battle_cards)
+        players = (self.challenger, self.opponent)
+        teams = (challenger_battle_cards, opponent_battle_cards)
+        renderer = BattleRenderer(battle_log, len(result.turns))
         battle_log_text = []
 
-        while challenger_battle_cards and opponent_battle_cards:
-            turn += 1 
-            await asyncio.sleep(2)  # Dramatic pause between turns
-
-            # Determine attacker and defender based on turn
-            if turn % 2 == 1:  # Challenger's turn
-                attacker_name = self.challenger.display_name
-                defender_name = self.opponent.display_name
-                attacker_cards = challenger_battle_cards
-                defender_cards = opponent_battle_cards
-            else:  # Opponent's turn
-                attacker_name = self.opponent.display_name
-                defender_name = self.challenger.display_name
-                attacker_cards = opponent_battle_cards
-                defender_cards = challenger_battle_cards
-
-            # Select random cards for attack/defense
-            attacking_card = random.choice(attacker_cards)
-            defending_card = random.choice(defender_cards)
-
-            # Calculate damage with a chance for critical hit
-            crit_chance = 0.25
-            crit_multiplier = 1.25
-            damage = attacking_card['attack']
-            
-            if random.random() < crit_chance:
-                damage = int(damage * crit_multiplier)
-                log_entry = f"**Turn {turn}:** {attacker_name}'s **{attacking_card['name']}** lands a CRITICAL HIT on {defender_name}'s **{defending_card['name']}** for {damage} damage!"
+        for turn_number, turn, living in replay_battle(challenger_battle_cards, opponent_battle_cards, result.turns):
+            attacker_name = players[turn.side].display_name
+            defender_name = players[1 - turn.side].display_name
+            attacking_card = teams[turn.side][turn.attacker]
+            defending_card = teams[1 - turn.side][turn.defender]
+
+            if turn.crit:
+                log_entry = f"**Turn {turn_number}:** {attacker_name}'s **{attacking_card['name']}** lands a CRITICAL HIT on {defender_name}'s **{defending_card['name']}** for {turn.damage} damage!"
             else:
-                log_entry = f"**Turn {turn}:** {attacker_name}'s **{attacking_card['name']}** attacks {defender_name}'s **{defending_card['name']}** for {damage} damage!"
-            
-            defending_card['health'] -= damage
+                log_entry = f"**Turn {turn_number}:** {attacker_name}'s **{attacking_card['name']}** attacks {defender_name}'s **{defending_card['name']}** for {turn.damage} damage!"
             battle_log_text.append(log_entry)
 
             # Check if defending card is defeated
-            if defending_card['health'] <= 0:
+            if turn.defender_health <= 0:
                 log_entry = f"💥 {defender_name}'s **{defending_card['name']}** has been defeated!"
                 battle_log_text.append(log_entry)
-                defender_cards.remove(defending_card)
 
-            # Update battle log (show last 10 actions)
-            recent_log = "\n".join(battle_log_text[-10:])
-
-            # Update the battle status embed
-            status_embed = discord.Embed(
-                title=f"⚔️ Battle: Turn {turn} ⚔️",
-                description=recent_log,
-                color=discord.Color.dark_red()
-            )
-
-            # Show current cards and their health
-            if challenger_battle_cards:
-                challenger_status = "\n".join([f"• **{card['name']}** (❤️ {card['health']})" for card in challenger_battle_cards])
-            else:
-                challenger_status = "*No cards left*"
-
-            if opponent_battle_cards:
-                opponent_status = "\n".join([f"• **{card['name']}** (❤️ {card['health']})" for card in opponent_battle_cards])
-            else:
-                opponent_status = "*No cards left*"
-
-            status_embed.add_field(name=f"{self.challenger.display_name}'s Team:", value=challenger_status, inline=True)
-            status_embed.add_field(name=f"{self.opponent.display_name}'s Team:", value=opponent_status, inline=True)
-            
-            await battle_log.edit(embed=status_embed)
+            if not renderer.wants_frame(turn_number):
+                continue
+            if not await renderer.show(turn_number, self._status_embed(turn_number, battle_log_text, living)):
+                break
 
         # Determine winner
-        if not opponent_battle_cards:
+        if result.winner == CHALLENGER:
             winner = self.challenger
             loser = self.opponent
             update_user_stats(self.challenger_id, 'battles_won')
@@ -1137,6 +2477,7 @@ class CardBattle:
         
         update_user_stats(self.challenger_id, 'battles_fought')
         update_user_stats(self.opponent_id, 'battles_fought')
+        activity_log.emit("battle", self.ctx.channel_id, self.challenger_id, self.opponent_id, value=result.winner)
 
         # Victory message
         victory_embed = discord.Embed(
@@ -1146,21 +2487,32 @@ class CardBattle:
         )
         await self.ctx.send(embed=victory_embed)
 
-    def _copy_card_for_battle(self, card_name):
-        original_card = next((c for c in cards if c['name'] == card_name), None)
-        if original_card:
-            return {
-                'name': original_card['name'],
-                'health': original_card['health'],
-                'attack': original_card.get('attack', 1)
-            }
-        # Fallback in case the card isn't found
-        return {
-            'name': card_name,
-            'health': 1,
-            'attack': 1
-        }
-    
+    def _status_embed(self, turn_number, battle_log_text, living):
+        # Update battle log (show last 10 actions)
+        recent_log = "\n".join(battle_log_text[-10:])
+
+        status_embed = discord.Embed(
+            title=f"⚔️ Battle: Turn {turn_number} ⚔️",
+            description=recent_log,
+            color=discord.Color.dark_red()
+        )
+
+        # Show current cards and their health
+        challenger_alive, opponent_alive = living
+        if challenger_alive:
+            challenger_status = "\n".join([f"• **{name}** (❤️ {health})" for name, health in challenger_alive])
+        else:
+            challenger_status = "*No cards left*"
+
+        if opponent_alive:
+            opponent_status = "\n".join([f"• **{name}** (❤️ {health})" for name, health in opponent_alive])
+        else:
+            opponent_status = "*No cards left*"
+
+        status_embed.add_field(name=f"{self.challenger.display_name}'s Team:", value=challenger_status, inline=True)
+        status_embed.add_field(name=f"{self.opponent.display_name}'s Team:", value=opponent_status, inline=True)
+        return status_embed
+
 class BattleInviteView(View):
     def __init__(self, battle):
         super().__init__(timeout=battle.timeout)
@@ -1179,29 +2531,19 @@ class BattleInviteView(View):
         await self.battle.ctx.send(f"{interaction.user.mention} has accepted the battle challenge! Both players must select their cards to begin.")
         
         # Send card selection directly in channel with ephemeral message (only visible to opponent)
-        user_cards = player_cards.get(str(interaction.user.id), [])
-        unique_cards = list(set(user_cards))
+        unique_cards = get_inventory(str(interaction.user.id)).unique()
         
         # Create card selection view for opponent
         view = CardSelectionView(self.battle, interaction.user, "opponent", unique_cards)
-        embed = discord.Embed(
-            title="Select Your Battle Cards",
-            description="Choose up to 3 cards for battle.\nClick Submit when you're done.",
-            color=discord.Color.blue()
-        )
+        embed = view.selection_embed()
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
         
         # Also send selection to challenger (in a separate ephemeral message)
-        challenger_cards = player_cards.get(self.battle.challenger_id, [])
-        unique_challenger_cards = list(set(challenger_cards))
+        unique_challenger_cards = get_inventory(self.battle.challenger_id).unique()
         
         # Create a new message for the challenger
         challenger_view = CardSelectionView(self.battle, self.battle.challenger, "challenger", unique_challenger_cards)
-        challenger_embed = discord.Embed(
-            title="Select Your Battle Cards",
-            description="Choose up to 3 cards for battle.\nClick Submit when you're done.",
-            color=discord.Color.blue()
-        )
+        challenger_embed = challenger_view.selection_embed()
         
         # Send the challenger their own ephemeral message (only they can see it)
         await self.battle.ctx.send(
@@ -1280,6 +2622,124 @@ class BattleCancelConfirmView(View):
         await interaction.response.send_message("Battle challenge not cancelled.", ephemeral=True)
         self.stop()
 
+ODDS_PREVIEW_BATTLES = 300
+
+def battle_stats(card_name):
+    # Cards given by admins don't have to exist in the catalog, those fight with 1 health
+    return battle_card(catalog.get(card_name) or {'name': card_name, 'health': 1})
+
+@functools.lru_cache(maxsize=4096)
+def _cached_odds(challenger_team: tuple, opponent_team: tuple) -> float:
+    return estimate_win_rate([battle_stats(name) for name in challenger_team],
+                             [battle_stats(name) for name in opponent_team],
+                             battles=ODDS_PREVIEW_BATTLES)
+
+def battle_odds(my_cards, their_cards, going_first: bool) -> float:
+    """Estimated chance my_cards beats their_cards, memoized by team composition.
+
+    Who picks which card is random every turn, so the order cards were picked in
+    doesn't matter and the teams are sorted for the cache key. The simulations are
+    seeded, so the same matchup always shows the same odds.
+    """
+    mine, theirs = tuple(sorted(my_cards)), tuple(sorted(their_cards))
+    if going_first:
+        return _cached_odds(mine, theirs)
+    return 1 - _cached_odds(theirs, mine)
+
+def likely_team(user_id: str, size=3) -> list[str]:
+    """The cards user_id would most likely pick: their strongest by health times attack."""
+    def strength(card_name):
+        stats = battle_stats(card_name)
+        return stats['health'] * stats['attack']
+    return sorted(get_inventory(user_id).unique(), key=strength, reverse=True)[:size]
+
+def rarity_tier(rarity) -> str:
+    # Same tiers the trade window marks with stars
+    if rarity == 0:
+        return "special"
+    elif rarity < 5:
+        return "rare"
+    elif rarity < 10:
+        return "uncommon"
+    return "common"
+
+class CardPicker:
+    """The cards one player can pick for battle, sorted every way up front.
+
+    Filtering by tier and name prefix only walks the pre-sorted list, and the
+    select options for each filter are built once and kept for the picker's life.
+    """
+    PAGE_SIZE = 25  # Discord's limit for select options
+    SORTS = ("name", "rarity", "attack", "health")
+    TIERS = ("all", "special", "rare", "uncommon", "common")
+
+    def __init__(self, card_names):
+        entries = [(name, battle_stats(name), catalog.rarity(name)) for name in card_names]
+        self._sorted = {
+            "name": sorted(entries, key=lambda entry: entry[0].casefold()),
+            "rarity": sorted(entries, key=lambda entry: (entry[2], entry[0].casefold())),
+            "attack": sorted(entries, key=lambda entry: (-entry[1]['attack'], entry[0].casefold())),
+            "health": sorted(entries, key=lambda entry: (-entry[1]['health'], entry[0].casefold())),
+        }
+        self._pages = {}  # (sort, tier, prefix) -> list of option pages
+        self.sort = "name"
+        self.tier = "all"
+        self.prefix = ""
+        self.page = 0
+
+    def _build_pages(self):
+        prefix = self.prefix.casefold()
+        options = [
+            discord.SelectOption(
+                label=name[:25],  # Limit to 25 chars for label
+                description=f"HP: {stats['health']} | ATK: {stats['attack']}",
+                value=name
+            )
+            for name, stats, rarity in self._sorted[self.sort]
+            if (self.tier == "all" or rarity_tier(rarity) == self.tier) and name.casefold().startswith(prefix)
+        ]
+        return [options[i:i + self.PAGE_SIZE] for i in range(0, len(options), self.PAGE_SIZE)] or [[]]
+
+    def pages(self):
+        key = (self.sort, self.tier, self.prefix)
+        if key not in self._pages:
+            self._pages[key] = self._build_pages()
+        return self._pages[key]
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages())
+
+    def options(self):
+        """Select options for the current page under the current sort and filters."""
+        self.page = min(self.page, self.page_count - 1)
+        return self.pages()[self.page]
+
+    def next_in(self, choices, current):
+        return choices[(choices.index(current) + 1) % len(choices)]
+
+    def describe(self) -> str:
+        filters = [f"sorted by {self.sort}"]
+        if self.tier != "all":
+            filters.append(f"{self.tier} cards")
+        if self.prefix:
+            filters.append(f"starting with '{self.prefix}'")
+        return f"Page {self.page + 1}/{self.page_count} • " + ", ".join(filters)
+
+class CardSearchModal(Modal):
+    def __init__(self, parent_view):
+        super().__init__(title="Search Your Cards")
+        self.parent_view = parent_view
+        self.prefix_input = TextInput(label="Card name starts with", placeholder="Leave empty to show all cards",
+                                      required=False, max_length=50)
+        self.add_item(self.prefix_input)
+
+    async def on_submit(self, interaction: discord.Interaction):
+        self.parent_view.battle.reset_activity_timer()
+        self.parent_view.picker.prefix = self.prefix_input.value.strip()
+        self.parent_view.picker.page = 0
+        await self.parent_view.refresh(interaction)
+
 class CardSelectionView(View):
     def __init__(self, battle, user, player_type, available_cards):
         super().__init__(timeout=battle.timeout)
@@ -1287,21 +2747,115 @@ class CardSelectionView(View):
         self.user = user
         self.player_type = player_type  # "challenger" or "opponent"
         self.available_cards = available_cards
+        self.picker = CardPicker(available_cards)
         self.selected_cards = []
         self.max_cards = 3
         self.selected_cards_text = ""
         
         # Add card selection dropdown
-        self.add_item(CardSelectMenu(self))
+        self.card_menu = CardSelectMenu(self)
+        self.add_item(self.card_menu)
+
+        # Paging, sorting and filtering for collections that don't fit in one dropdown
+        self.prev_button = Button(label="◀", style=discord.ButtonStyle.secondary, row=1)
+        self.prev_button.callback = self.previous_page
+        self.next_button = Button(label="▶", style=discord.ButtonStyle.secondary, row=1)
+        self.next_button.callback = self.next_page
+        self.sort_button = Button(style=discord.ButtonStyle.secondary, row=1)
+        self.sort_button.callback = self.cycle_sort
+        self.tier_button = Button(style=discord.ButtonStyle.secondary, row=1)
+        self.tier_button.callback = self.cycle_tier
+        self.search_button = Button(label="Search", style=discord.ButtonStyle.secondary, emoji="🔍", row=1)
+        self.search_button.callback = self.search
+        for button in (self.prev_button, self.next_button, self.sort_button, self.tier_button, self.search_button):
+            self.add_item(button)
         
         # Add card removal dropdown if needed
         self.remove_button = Button(
             label="Remove Card", 
             style=discord.ButtonStyle.red,
-            disabled=True
+            disabled=True,
+            row=2
         )
         self.remove_button.callback = self.remove_card
         self.add_item(self.remove_button)
+        self.update_picker_buttons()
+
+    def update_picker_buttons(self):
+        self.prev_button.disabled = self.picker.page == 0
+        self.next_button.disabled = self.picker.page >= self.picker.page_count - 1
+        self.sort_button.label = f"Sort: {self.picker.sort.title()}"
+        self.tier_button.label = f"Show: {self.picker.tier.title()}"
+
+    async def refresh(self, interaction: discord.Interaction):
+        """Rebuild the dropdown for the picker's current page and filters."""
+        self.remove_item(self.card_menu)
+        self.card_menu = CardSelectMenu(self)
+        self.add_item(self.card_menu)
+        self.update_picker_buttons()
+        await interaction.response.edit_message(embed=self.selection_embed(), view=self)
+
+    async def check_user(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.user.id:
+            await interaction.response.send_message("This isn't your battle card selection!", ephemeral=True)
+            return False
+        self.battle.reset_activity_timer()
+        return True
+
+    async def previous_page(self, interaction: discord.Interaction):
+        if await self.check_user(interaction):
+            self.picker.page = max(0, self.picker.page - 1)
+            await self.refresh(interaction)
+
+    async def next_page(self, interaction: discord.Interaction):
+        if await self.check_user(interaction):
+            self.picker.page = min(self.picker.page_count - 1, self.picker.page + 1)
+            await self.refresh(interaction)
+
+    async def cycle_sort(self, interaction: discord.Interaction):
+        if await self.check_user(interaction):
+            self.picker.sort = self.picker.next_in(CardPicker.SORTS, self.picker.sort)
+            self.picker.page = 0
+            await self.refresh(interaction)
+
+    async def cycle_tier(self, interaction: discord.Interaction):
+        if await self.check_user(interaction):
+            self.picker.tier = self.picker.next_in(CardPicker.TIERS, self.picker.tier)
+            self.picker.page = 0
+            await self.refresh(interaction)
+
+    async def search(self, interaction: discord.Interaction):
+        if await self.check_user(interaction):
+            await interaction.response.send_modal(CardSearchModal(self))
+
+    def selection_embed(self):
+        description = "Choose up to 3 cards for battle.\nClick Submit when you're done."
+        if self.selected_cards:
+            description += f"\n\n**Current Selection:**\n{self.selected_cards_text}"
+        embed = discord.Embed(
+            title="Select Your Battle Cards",
+            description=description,
+            color=discord.Color.blue()
+        )
+        if self.selected_cards:
+            embed.add_field(name="Win Chance", value=self.odds_text(), inline=False)
+        embed.set_footer(text=self.picker.describe())
+        return embed
+
+    def odds_text(self):
+        """Estimated odds of the current selection against the other player's team."""
+        going_first = self.player_type == "challenger"
+        if going_first:
+            revealed, their_cards, their_id = self.battle.opponent_selected, self.battle.opponent_cards, self.battle.opponent_id
+        else:
+            revealed, their_cards, their_id = self.battle.challenger_selected, self.battle.challenger_cards, self.battle.challenger_id
+        if not revealed:
+            their_cards = likely_team(their_id)
+        if not their_cards:
+            return "Unknown"
+        odds = battle_odds(self.selected_cards, their_cards, going_first)
+        against = "their team" if revealed else "their strongest cards"
+        return f"**{odds:.0%}** against {against}"
     
     async def remove_card(self, interaction: discord.Interaction):
         if interaction.user.id != self.user.id:
@@ -1323,7 +2877,7 @@ class CardSelectionView(View):
             ephemeral=True
         )
     
-    @discord.ui.button(label="Submit Selection", style=discord.ButtonStyle.green)
+    @discord.ui.button(label="Submit Selection", style=discord.ButtonStyle.green, row=2)
     async def submit_cards(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user.id != self.user.id:
             await interaction.response.send_message("This isn't your battle card selection!", ephemeral=True)
@@ -1337,14 +2891,11 @@ class CardSelectionView(View):
             return
         
         # Store the selected cards in the battle object
+        self.battle.submit_selection(self.player_type, self.selected_cards)
         if self.player_type == "challenger":
-            self.battle.challenger_cards = self.selected_cards
-            self.battle.challenger_selected = True
             waiting_for = "opponent"
             waiting_user = self.battle.opponent.display_name
         else:
-            self.battle.opponent_cards = self.selected_cards
-            self.battle.opponent_selected = True
             waiting_for = "challenger"
             waiting_user = self.battle.challenger.display_name
         
@@ -1386,34 +2937,25 @@ class CardSelectionView(View):
 class CardSelectMenu(discord.ui.Select):
     def __init__(self, parent_view):
         self.parent_view = parent_view
-        
-        # Create options from available cards
-        options = []
-        for i, card_name in enumerate(parent_view.available_cards[:25]):  # Discord limit of 25 options
-            if i >= 25:  # Ensure we don't exceed Discord's limit
-                break
-                
-            card_data = next((c for c in cards if c["name"] == card_name), None)
-            if card_data:
-                # Handle both 'damage' and 'attack' attributes for compatibility
-                attack_value = card_data.get('attack', card_data.get('attack', 1))
-                option = discord.SelectOption(
-                    label=card_name[:25],  # Limit to 25 chars for label
-                    description=f"HP: {card_data['health']} | ATK: {attack_value}",
-                    value=card_name
-                )
-                options.append(option)
-        
+        picker = parent_view.picker
+
+        # Options for the current page, built once per page by the picker
+        options = picker.options()
+        placeholder = "Select a card to add to your team..."
+        if picker.page_count > 1:
+            placeholder = f"Select a card to add to your team (page {picker.page + 1}/{picker.page_count})..."
+
         # If no options, create a placeholder option
         if not options:
             options = [discord.SelectOption(label="No cards available", value="none")]
         
         super().__init__(
-            placeholder="Select a card to add to your team...",
+            placeholder=placeholder,
             min_values=1,
             max_values=1,
             options=options,
-            disabled=len(options) == 1 and options[0].value == "none"
+            disabled=len(options) == 1 and options[0].value == "none",
+            row=0
         )
     
     async def callback(self, interaction: discord.Interaction):
@@ -1443,11 +2985,7 @@ class CardSelectMenu(discord.ui.Select):
                 self.parent_view.selected_cards_text = ", ".join(self.parent_view.selected_cards)
                 
                 # Create a new embed showing the current selection
-                embed = discord.Embed(
-                    title="Select Your Battle Cards",
-                    description=f"Choose up to 3 cards for battle.\nClick Submit when you're done.\n\n**Current Selection:**\n{self.parent_view.selected_cards_text}",
-                    color=discord.Color.blue()
-                )
+                embed = self.parent_view.selection_embed()
                 
                 # Update the message with the new embed and view
                 try:
@@ -1497,11 +3035,7 @@ class RemoveCardView(discord.ui.View):
                 self.parent_view.remove_button.disabled = True
             
             # Update the parent embed
-            embed = discord.Embed(
-                title="Select Your Battle Cards",
-                description=f"Choose up to 3 cards for battle.\nClick Submit when you're done.\n\n**Current Selection:**\n{self.parent_view.selected_cards_text}",
-                color=discord.Color.blue()
-            )
+            embed = self.parent_view.selection_embed()
             
             # Acknowledge the removal
             await interaction.response.send_message(f"Removed {card_to_remove} from your selection.", ephemeral=True)
@@ -1545,7 +3079,7 @@ class LeaderboardView(discord.ui.View):
         self.clear_items()
         self.select = LeaderboardSelect(self, selected=self.category)
         self.add_item(self.select)
-        embed = await get_leaderboard_embed(category)
+        embed = await leaderboard_embeds.get(category)
         await interaction.response.edit_message(embed=embed, view=self)
 
 class LeaderboardSelect(discord.ui.Select):
@@ -1564,14 +3098,12 @@ class LeaderboardSelect(discord.ui.Select):
         await self.parent_view.update_leaderboard(interaction, self.values[0])
 
 async def get_leaderboard_embed(category: str):
-    global cards
     category = category.lower()
-    regular_users = {user_id: cards_ for user_id, cards_ in player_cards.items() if user_id not in authorized_user_ids}
-    total_users = len(regular_users)
-    total_cards_collected = sum(len(cards_) for cards_ in regular_users.values())
+    total_users = leaderboard.user_count
+    total_cards_collected = leaderboard.total_cards
     embed = None
 
-    if not regular_users or total_cards_collected == 0:
+    if not total_users or total_cards_collected == 0:
         embed = discord.Embed(
             title="235th Dex Statistics", 
             description="Not enough data to display statistics yet!",
@@ -1580,30 +3112,10 @@ async def get_leaderboard_embed(category: str):
         return embed
     
     if category == "general":
-        collectors = [(user_id, len(cards)) for user_id, cards in regular_users.items()]
-        top_collectors = sorted(collectors, key=lambda x: x[1], reverse=True)[:5]
-        unique_collectors = [(user_id, len(set(cards))) for user_id, cards in regular_users.items()]
-        top_unique_collectors = sorted(unique_collectors, key=lambda x: x[1], reverse=True)[:5]
-        all_cards = [card for cards in regular_users.values() for card in cards]
-        card_counts = Counter(all_cards)
-        most_collected_card = card_counts.most_common(1)[0][0] if card_counts else "None"
-        most_collected_count = card_counts.get(most_collected_card, 0)
-        card_rarity = {card['name']: card['rarity'] for card in cards}
-        unique_owned_cards = set(all_cards)
-
-        if unique_owned_cards:
-            try:
-                rarest_card_owned = min(
-                    (c for c in unique_owned_cards if card_rarity.get(c, 100) > 0 or c == "Sigma-squad"),
-                    key=lambda card: card_rarity.get(card, float('inf'))
-                )
-                rarest_card_rarity = card_rarity.get(rarest_card_owned, "Unknown")
-            except (ValueError, KeyError):
-                rarest_card_owned = "Error determining rarest card"
-                rarest_card_rarity = "Unknown"
-        else:
-            rarest_card_owned = "None"
-            rarest_card_rarity = "N/A"
+        top_collectors = leaderboard.top_total(5)
+        top_unique_collectors = leaderboard.top_unique(5)
+        most_collected_card, most_collected_count = leaderboard.most_collected() or ("None", 0)
+        rarest_card_owned, rarest_card_rarity = leaderboard.rarest_owned() or ("None", "N/A")
         
         embed = discord.Embed(
             title="📊 235th Dex Leaderboard",
@@ -1634,8 +3146,7 @@ async def get_leaderboard_embed(category: str):
         embed.add_field(name="🃏 Card Stats", value="\n".join(card_stats), inline=False)
     
     elif category == "total":
-        collectors = [(user_id, len(cards)) for user_id, cards in regular_users.items()]
-        top_collectors = sorted(collectors, key=lambda x: x[1], reverse=True)[:10]
+        top_collectors = leaderboard.top_total(10)
         embed = discord.Embed(
             title="🏆 Total Cards Leaderboard",
             description="Players ranked by total number of cards owned (including duplicates)",
@@ -1658,8 +3169,7 @@ async def get_leaderboard_embed(category: str):
             embed.add_field(name="Leaderboard", value="No data available yet", inline=False)
     
     elif category == "unique":
-        unique_collectors = [(user_id, len(set(cards))) for user_id, cards in regular_users.items()]
-        top_unique = sorted(unique_collectors, key=lambda x: x[1], reverse=True)[:10]
+        top_unique = leaderboard.top_unique(10)
         total_available_cards = len(cards)
         completion_data = [(user_id, count, round((count / total_available_cards) * 100, 1)) 
                           for user_id, count in top_unique]
@@ -1685,20 +3195,8 @@ async def get_leaderboard_embed(category: str):
             embed.add_field(name="Leaderboard", value="No data available yet", inline=False)
     
     elif category == "rarest":
-        card_rarity = {card['name']: card['rarity'] for card in cards}
-        rarest_cards = []
-        for card in cards:
-            if card['rarity'] == 0 and card['name'] != "Sigma-squad":
-                continue
-            rarest_cards.append((card['name'], card['rarity']))
-        rarest_cards = sorted(rarest_cards, key=lambda x: x[1])[:10]
-        rarest_cards_with_owners = []
-        for card_name, rarity in rarest_cards:
-            owners = []
-            for user_id, user_cards in regular_users.items():
-                if card_name in user_cards:
-                    owners.append(user_id)
-            rarest_cards_with_owners.append((card_name, rarity, owners))
+        rarest_cards_with_owners = [(card_name, rarity, leaderboard.owners_of(card_name))
+                                    for card_name, rarity in rarity_ranking[:10]]
         embed = discord.Embed(
             title="💎 Rarest Cards Leaderboard",
             description="The rarest cards and their lucky owners",
@@ -1754,6 +3252,48 @@ async def get_leaderboard_embed(category: str):
     embed.set_footer(text=f"Stats as of {current_time}")
     return embed
 
+class LeaderboardEmbedCache:
+    """Rendered leaderboard embeds, shared until the inventories change or ttl runs out.
+
+    Requests for a category that is already being built wait for that build
+    instead of starting another one. Cached embeds are shared, so don't modify them.
+    """
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._entries = {}  # category -> (inventory_version, built at, embed)
+        self._building = {}  # category -> future for the build in progress
+        self.hits = 0
+        self.misses = 0
+        self.shared_builds = 0
+
+    async def get(self, category: str):
+        category = category.lower()
+        entry = self._entries.get(category)
+        if entry and entry[0] == inventory_version and time.monotonic() - entry[1] < self.ttl:
+            self.hits += 1
+            return entry[2]
+
+        if category in self._building:
+            self.shared_builds += 1
+            return await asyncio.shield(self._building[category])
+
+        self.misses += 1
+        version = inventory_version
+        build = asyncio.ensure_future(get_leaderboard_embed(category))
+        self._building[category] = build
+        try:
+            embed = await asyncio.shield(build)
+        finally:
+            self._building.pop(category, None)
+        self._entries[category] = (version, time.monotonic(), embed)
+        return embed
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses + self.shared_builds
+        return (self.hits + self.shared_builds) / lookups if lookups else 0.0
+
+leaderboard_embeds = LeaderboardEmbedCache()
+
 #=================================================================
 # COMMANDS
 #=================================================================
@@ -1787,7 +3327,7 @@ async def unblacklist_user(ctx, user_id: str):
 @bot.command(name="show_blacklist")
 @commands.check(is_authorized)
 async def show_blacklist(ctx):
-    blacklist = BlacklistManager.load_blacklist()
+    blacklist = BlacklistManager.blacklisted_ids()
     if blacklist:
         await ctx.send(f"Blacklisted user IDs: {', '.join(blacklist)}")
     else:
@@ -1797,7 +3337,7 @@ async def show_blacklist(ctx):
 @commands.check(is_authorized)
 async def force_backup(ctx):
     try:
-        create_backup()
+        await backup_player_cards()
         await ctx.send("Backup created successfully.")
     except Exception as e:
         await ctx.send(f"Backup failed: {str(e)}")
@@ -1816,7 +3356,7 @@ async def set_spawn_mode(ctx, mode: str):
     else:
         await ctx.send("Invalid mode. Please choose from 'both', 'test', or 'none'.")
 
-@bot.command(name='spawn_card', help="Spawn a specific card.")
+@bot.command(name='spawn_card', help="Spawn a specific card, or 'random' for a weighted random one.")
 @commands.check(is_authorized)
 async def spawn_card_command(ctx, *, args: str):
     args = args.strip().lower()
@@ -1848,7 +3388,7 @@ async def spawn_card_command(ctx, *, args: str):
         await ctx.send("Invalid card name. Only alphanumeric characters, spaces, apostrophes, and hyphens are allowed.")
         return
 
-    card = next((card for card in cards if card_name == card["name"].lower() or card_name in [alias.lower() for alias in card.get("aliases", [])]), None)
+    card = spawn_sampler.sample() if card_name == 'random' else catalog.resolve(card_name)
     if card:
         # Choose the channel based on the parameters
         if use_test_channel:
@@ -1878,10 +3418,7 @@ async def admin_give_card(ctx, card: str, receiving_user: discord.Member):
     receiver_id = str(receiving_user.id)
     card_lower = card.lower()
 
-    receiver_cards = player_cards.setdefault(receiver_id, [])
-    receiver_cards.append(card)
-
-    save_player_cards()  # Save the updated player cards
+    await transfer_cards([(None, receiver_id, card)])
     await ctx.send(f"{ctx.author.mention} has given `{card}` to {receiving_user.mention}.")
     logging.info(f"Admin: {ctx.author} gave {card} to {receiving_user}.")
 
@@ -1889,13 +3426,12 @@ async def admin_give_card(ctx, card: str, receiving_user: discord.Member):
 @commands.check(is_authorized)
 async def remove_card(ctx, card: str, user: discord.Member):
     user_id = str(user.id)
-    card_lower = card.lower()
 
-    user_cards = player_cards.get(user_id, [])
-    if card_lower in map(str.lower, user_cards):
-        actual_card_name = next(c for c in user_cards if c.lower() == card_lower)
-        user_cards.remove(actual_card_name)
-        save_player_cards()  # Save the updated player cards
+    async with user_locks.hold(user_id):
+        actual_card_name = find_owned_card(user_id, card)
+        if actual_card_name:
+            await remove_card_from_user(user_id, actual_card_name)
+    if actual_card_name:
         await ctx.send(f"Removed `{actual_card_name}` from {user.mention}'s inventory.")
         logging.info(f"Admin: {ctx.author} removed {actual_card_name} from {user}.")
     else:
@@ -1916,7 +3452,7 @@ async def view_user(ctx, user: discord.Member):
     
     target_user_id = str(user.id)
     total_cards_count = len(cards)
-    user_cards = player_cards.get(target_user_id, [])
+    inventory = get_inventory(target_user_id)
     
     # Create main embed with user info
     embed = discord.Embed(
@@ -1940,7 +3476,7 @@ async def view_user(ctx, user: discord.Member):
     )
     
     # Add card collection stats
-    if not user_cards:
+    if not inventory:
         embed.add_field(
             name="Card Collection",
             value="This user hasn't collected any cards yet.",
@@ -1948,17 +3484,19 @@ async def view_user(ctx, user: discord.Member):
         )
     else:
         # Count total unique cards (no duplicates)
-        unique_cards = set(user_cards)
+        unique_cards = inventory.unique()
         # Get card duplicates info
-        card_counts = Counter(user_cards)
+        card_counts = Counter(dict(inventory.items()))
         # Calculate duplicates
-        total_duplicates = len(user_cards) - len(unique_cards)
+        total_duplicates = len(inventory) - len(unique_cards)
         
         # Find rarest card owned by rarity value
         card_rarity = {card_info['name']: card_info['rarity'] for card_info in cards}
         try:
-            rarest_card = min(set(user_cards), key=lambda card_name: card_rarity.get(card_name, float('inf')))
-            rarest_card_value = f"{rarest_card} ({card_rarity.get(rarest_card, '?')}% rarity)"
+            rarest_card = min(unique_cards, key=lambda card_name: card_rarity.get(card_name, float('inf')))
+            rarest_owner_count = len(card_owners.owners_of(rarest_card))
+            rarest_card_value = (f"{rarest_card} ({card_rarity.get(rarest_card, '?')}% rarity, "
+                                 f"{rarest_owner_count} owner{'s' if rarest_owner_count != 1 else ''})")
             
             most_duplicated_card = card_counts.most_common(1)[0][0] if total_duplicates > 0 else "None"
             most_duplicated_value = f"{most_duplicated_card} ({card_counts[most_duplicated_card]}x)" if most_duplicated_card != "None" else "None"
@@ -1971,11 +3509,13 @@ async def view_user(ctx, user: discord.Member):
         uncommon_cards = sum(1 for card in unique_cards if 10 <= card_rarity.get(card, 100) < 20)
         rare_cards = sum(1 for card in unique_cards if 5 <= card_rarity.get(card, 100) < 10)
         very_rare_cards = sum(1 for card in unique_cards if card_rarity.get(card, 100) < 5)
+        sole_owner_cards = sum(1 for card in unique_cards if len(card_owners.owners_of(card)) == 1)
         
         collection_info = (
             f"• Progress: **{len(unique_cards)}/{total_cards_count}** unique cards ({len(unique_cards)/total_cards_count*100:.1f}%)\n"
-            f"• Total Cards: **{len(user_cards)}** (including {total_duplicates} duplicates)\n"
+            f"• Total Cards: **{len(inventory)}** (including {total_duplicates} duplicates)\n"
             f"• Card Rarity: {common_cards} common, {uncommon_cards} uncommon, {rare_cards} rare, {very_rare_cards} very rare\n"
+            f"• Only Owner Of: {sole_owner_cards} card{'s' if sole_owner_cards != 1 else ''}\n"
             f"• Rarest Owned: {rarest_card_value}\n"
             f"• Most Duplicated: {most_duplicated_value}"
         )
@@ -2003,19 +3543,78 @@ async def view_user(ctx, user: discord.Member):
 
     await ctx.send(embed=embed)
 
-    if user_cards:
-        missing_cards = [card_info['name'] for card_info in cards if card_info['name'] not in user_cards]
-        view = ProgressView(user_cards, missing_cards, ctx.author, display_name_override=user.display_name)
+    if inventory:
+        missing_cards = [card_info['name'] for card_info in cards if not inventory.has(card_info['name'])]
+        view = ProgressView(inventory, missing_cards, ctx.author, display_name_override=user.display_name)
         await ctx.send("📚 **Card Collection Details:**", embed=view.create_embed(), view=view)
 
     logging.info(f"Admin {ctx.author} viewed detailed information for {user.display_name} (ID: {target_user_id})")
 
+@bot.command(name='who_owns', aliases=['owners'], help="Admin command to list everyone who owns a card")
+@commands.check(is_authorized)
+async def who_owns(ctx, *, card: str):
+    """
+    Lists the owners of a card with how many copies each has, most copies first.
+    Usage: !who_owns [card name or alias]
+    """
+    # Cards given by admins don't have to exist in the catalog, so match owned names ignoring case too
+    card_data = catalog.resolve(card)
+    card_name = card_owners.find(card) or (card_data['name'] if card_data else card)
+    owners = card_owners.owners_of(card_name)
+    if not owners:
+        await ctx.send(f"Nobody owns `{card_name}`.")
+        return
+
+    ranked = sorted(owners.items(), key=lambda owner: owner[1], reverse=True)
+    owner_lines = [f"{idx+1}. <@{user_id}>: **{count}**×" for idx, (user_id, count) in enumerate(ranked[:20])]
+    if len(ranked) > 20:
+        owner_lines.append(f"...and {len(ranked) - 20} more")
+
+    embed = discord.Embed(
+        title=f"🔎 Owners of {card_name}",
+        description="\n".join(owner_lines),
+        color=discord.Color.teal()
+    )
+    embed.set_footer(text=f"{len(owners)} owners • {card_owners.copies_of(card_name)} copies in total")
+    await ctx.send(embed=embed, allowed_mentions=discord.AllowedMentions.none())
+    logging.info(f"Admin {ctx.author} looked up the owners of {card_name}")
+
+@bot.command(name='activity', help="Admin command to show catches, trades, gives and battles over time")
+@commands.check(is_authorized)
+async def activity(ctx, days: int = 7):
+    """
+    Shows how many of each event happened recently, from the activity rollups.
+    Usage: !activity [days, default 7]
+    """
+    days = max(1, min(days, 365))
+    now = time.time()
+    today = int(now) - int(now) % ActivityLog.DAY
+    week_start = today - (days - 1) * ActivityLog.DAY
+
+    embed = discord.Embed(title="📈 Bot Activity", color=discord.Color.teal())
+    for kind in ActivityLog.KINDS:
+        last_day = activity_log.count(kind, now - ActivityLog.DAY, now)
+        this_channel = activity_log.count(kind, now - ActivityLog.DAY, now, channel_id=ctx.channel.id)
+        period = activity_log.count(kind, week_start, today + ActivityLog.DAY)
+        embed.add_field(
+            name=f"{kind.capitalize()}s",
+            value=f"Last 24h: **{last_day}** ({this_channel} here)\nLast {days} days: **{period}**",
+            inline=True
+        )
+
+    hourly_catches = activity_log.series("catch", now - ActivityLog.DAY, now, channel_id=ctx.channel.id)
+    if hourly_catches:
+        busiest, catches = max(hourly_catches.items(), key=lambda bucket: bucket[1])
+        embed.add_field(name="Busiest Hour Here",
+                        value=f"<t:{busiest}:t> with **{catches}** catches", inline=False)
+    embed.set_footer(text="Days are UTC")
+    await ctx.send(embed=embed)
+
 @bot.command(name='shutdown', help="Shut down the bot.")
 @commands.check(is_authorized)
 async def shutdown(ctx):
     await ctx.send("Shutting down the bot...")
     logging.info(f"Shutdown command issued by {ctx.author}.")
-    save_player_cards()
     await shutdown_bot()
 
 # Card Collection Commands
@@ -2023,21 +3622,21 @@ async def shutdown(ctx):
 async def progress_slash(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
     total_cards = len(cards)
-    user_cards = player_cards.get(user_id, [])
-    missing_cards = [card['name'] for card in cards if card['name'] not in user_cards]
+    inventory = get_inventory(user_id)
+    missing_cards = [card['name'] for card in cards if not inventory.has(card['name'])]
 
-    view = ProgressView(user_cards, missing_cards, interaction.user)
+    view = ProgressView(inventory, missing_cards, interaction.user)
     view.message = await interaction.response.send_message(embed=view.create_embed(), view=view)
 
 @bot.tree.command(name="show_random_card", description="Show a random card you own")
 async def show_random_card_slash(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
-    user_cards = player_cards.get(user_id, [])
-    if not user_cards:
+    inventory = get_inventory(user_id)
+    if not inventory:
         await interaction.response.send_message("You don't have any cards yet!")
         return
-    card_name = random.choice(user_cards)
-    card = next((c for c in cards if c['name'] == card_name), None)
+    card_name = inventory.random_card()
+    card = catalog.get(card_name)
     if not card:
         await interaction.response.send_message(f"Card data for `{card_name}` not found.")
         return
@@ -2055,25 +3654,13 @@ async def show_random_card_slash(interaction: discord.Interaction):
 @app_commands.autocomplete(card_name=card_name_autocomplete)
 async def see_card_slash(interaction: discord.Interaction, card_name: str):
     user_id = str(interaction.user.id)
-    user_cards = player_cards.get(user_id, [])
-    if not user_cards:
+    inventory = get_inventory(user_id)
+    if not inventory:
         await interaction.response.send_message("You haven't caught any cards yet.", ephemeral=True)
         return
 
-    card_name_lower = card_name.strip().lower()
-    user_card = next(
-        (card for card in user_cards if
-         card.lower() == card_name_lower or
-         any(card_name_lower == alias.lower() for alias in next((c.get('aliases', []) for c in cards if c['name'].lower() == card.lower()), []))
-        ),
-        None
-    )
-    if user_card:
-        selected_card = next(
-            card for card in cards
-            if card["name"].lower() == card_name_lower or
-               card_name_lower in [alias.lower() for alias in card.get("aliases", [])]
-        )
+    selected_card = catalog.resolve(card_name.strip())
+    if selected_card and inventory.has(selected_card['name']):
         embed = discord.Embed(title=f"Here's your {selected_card['name']}", description="")
         embed.set_image(url=selected_card["card_image_url"])
         await interaction.response.send_message(embed=embed)
@@ -2085,21 +3672,8 @@ async def see_card_slash(interaction: discord.Interaction, card_name: str):
 @app_commands.autocomplete(card_name=card_name_autocomplete)
 async def stats_slash(interaction: discord.Interaction, card_name: str):
     user_id = str(interaction.user.id)
-    user_cards = player_cards.get(user_id, [])
-    card_name_lower = card_name.strip().lower()
-    user_card = next(
-        (card for card in user_cards if
-         card.lower() == card_name_lower or
-         any(card_name_lower == alias.lower() for alias in next((c.get('aliases', []) for c in cards if c['name'].lower() == card.lower()), []))
-        ),
-        None
-    )
-    if user_card:
-        selected_card = next(
-            card for card in cards
-            if card["name"].lower() == card_name_lower or
-               card_name_lower in [alias.lower() for alias in card.get("aliases", [])]
-        )
+    selected_card = catalog.resolve(card_name.strip())
+    if selected_card and get_inventory(user_id).has(selected_card['name']):
         embed = discord.Embed(title=f"Stats for {selected_card['name']}", description="")
         embed.add_field(name="Health", value=selected_card["health"], inline=True)
         embed.add_field(name="Damage", value=selected_card["attack"], inline=True)
@@ -2122,7 +3696,6 @@ async def give_card_slash(
 ):
     sender_id = str(interaction.user.id)
     receiver_id = str(receiving_user.id)
-    card_lower = card.lower()
     
     if receiving_user.id == interaction.user.id:
         await interaction.response.send_message("You can't give a card to yourself!", ephemeral=True)
@@ -2131,41 +3704,28 @@ async def give_card_slash(
         await interaction.response.send_message("You can't give a card to a bot!", ephemeral=True)
         return
 
-    async with battle_lock:
-        try:
-            sender_cards = player_cards.get(sender_id, [])
-            if not any(
-                card_lower == c.lower() or 
-                card_lower in [alias.lower() for alias in next((card_obj['aliases'] for card_obj in cards if card_obj['name'].lower() == c.lower()), [])]
-                for c in sender_cards
-            ):
-                await interaction.response.send_message(f"You don't own the card `{card}`.", ephemeral=True)
-                return
-            
-            # Find the exact card name (preserving case)
-            actual_card_name = next(
-                (c for c in sender_cards if
-                 card_lower == c.lower() or
-                 card_lower in [alias.lower() for alias in next((card_obj['aliases'] for card_obj in cards if card_obj['name'].lower() == c.lower()), [])]
-                ),
-                None
-            )
-            if not actual_card_name:
-                await interaction.response.send_message(f"Error finding card `{card}` in your inventory.", ephemeral=True)
-                return
-                
-            # Remove the card from the sender's inventory
-            sender_cards.remove(actual_card_name)
-            receiver_cards = player_cards.setdefault(receiver_id, [])
-            receiver_cards.append(actual_card_name)
-            save_player_cards()
-            await interaction.response.send_message(
-                f"{interaction.user.mention} has given `{actual_card_name}` to {receiving_user.mention}."
-            )
-            logging.info(f"{interaction.user} gave {actual_card_name} to {receiving_user}.")
-        except Exception as e:
-            logging.error(f"Error in card transfer: {e}", exc_info=True)
-            await interaction.response.send_message("An error occurred during card transfer.", ephemeral=True)
+    # Find the exact card name (preserving case)
+    actual_card_name = find_owned_card(sender_id, card)
+    if not actual_card_name:
+        await interaction.response.send_message(f"You don't own the card `{card}`.", ephemeral=True)
+        return
+
+    try:
+        await transfer_cards([(sender_id, receiver_id, actual_card_name)],
+                             {sender_id: get_inventory(sender_id).version})
+    except TransferError:
+        await interaction.response.send_message(f"You don't own the card `{card}`.", ephemeral=True)
+        return
+    except Exception as e:
+        logging.error(f"Error in card transfer: {e}", exc_info=True)
+        await interaction.response.send_message("An error occurred during card transfer.", ephemeral=True)
+        return
+
+    activity_log.emit("give", interaction.channel_id, sender_id, receiver_id, card_name=actual_card_name)
+    await interaction.response.send_message(
+        f"{interaction.user.mention} has given `{actual_card_name}` to {receiving_user.mention}."
+    )
+    logging.info(f"{interaction.user} gave {actual_card_name} to {receiving_user}.")
 
 @bot.tree.command(name="battle", description="Challenge another user to a card battle")
 @app_commands.describe(
@@ -2313,18 +3873,7 @@ class Trade(commands.GroupCog, name="trade"):
         if (is_initiator and trade.initiator_confirmed) or (not is_initiator and trade.recipient_confirmed):
             await interaction.response.send_message("You've already confirmed the trade! Use `/trade unconfirm` to make changes.", ephemeral=True)
             return
-        user_cards = player_cards.get(user_id, [])
-        card_lower = card.lower()
-        found_card = None
-        for c in user_cards:
-            card_data = next((ci for ci in cards if ci['name'].lower() == c.lower()), None)
-            if c.lower() == card_lower:
-                found_card = c
-                break
-            elif card_data and 'aliases' in card_data:
-                if card_lower in [alias.lower() for alias in card_data['aliases']]:
-                    found_card = c
-                    break
+        found_card = find_owned_card(user_id, card)
         if not found_card:
             await interaction.response.send_message(f"You don't have a card named `{card}`!", ephemeral=True)
             return
@@ -2358,18 +3907,8 @@ class Trade(commands.GroupCog, name="trade"):
         if (is_initiator and trade.initiator_confirmed) or (not is_initiator and trade.recipient_confirmed):
             await interaction.response.send_message("You've already confirmed the trade! Use `/trade unconfirm` to make changes.", ephemeral=True)
             return
-        card_lower = card.lower()
         user_trade_cards = trade.initiator_cards if is_initiator else trade.recipient_cards
-        card_to_remove = None
-        for c in user_trade_cards:
-            card_data = next((ci for ci in cards if ci['name'].lower() == c.lower()), None)
-            if c.lower() == card_lower:
-                card_to_remove = c
-                break
-            elif card_data and 'aliases' in card_data:
-                if card_lower in [alias.lower() for alias in card_data['aliases']]:
-                    card_to_remove = c
-                    break
+        card_to_remove = find_card_in(user_trade_cards, card)
         if not card_to_remove:
             await interaction.response.send_message(f"You don't have `{card}` in your trade offer!", ephemeral=True)
             return
@@ -2586,9 +4125,13 @@ async def info_slash(interaction: discord.Interaction):
     minutes, _ = divmod(remainder, 60)
     uptime_str = f"{days}d {hours}h {minutes}m"
 
-    total_users = len(player_cards)
-    total_cards_collected = sum(len(cards) for cards in player_cards.values())
-    backup_count = len([f for f in os.listdir(backup_folder) if f.startswith("player_cards_backup_")])
+    total_users = card_stats.total_users
+    total_cards_collected = card_stats.total_cards
+    backup_count = storage.count_backups()
+    live_sessions = session_deadlines.live_sessions()
+    spawn_latencies = list(spawn_latency_per_channel.values())
+    spawn_latency_str = (f"{sum(spawn_latencies) / len(spawn_latencies) * 1000:.0f} ms avg, "
+                         f"{max(spawn_latencies) * 1000:.0f} ms slowest" if spawn_latencies else "No spawns yet")
 
     embed = discord.Embed(
         title="235th Dex Information",
@@ -2615,6 +4158,11 @@ async def info_slash(interaction: discord.Interaction):
             f"• **Users:** {total_users}\n"
             f"• **Cards Collected:** {total_cards_collected}\n"
             f"• **Uptime:** {uptime_str}\n"
+            f"• **Open Trades/Battles:** {live_sessions['TradeSession']}/{live_sessions['CardBattle']} "
+            f"({session_deadlines.pending_deadlines} timeouts pending)\n"
+            f"• **Leaderboard Cache:** {leaderboard_embeds.hit_rate():.0%} hits "
+            f"({leaderboard_embeds.misses} builds)\n"
+            f"• **Spawn Latency:** {spawn_latency_str}\n"
             f"• **Lines of Code:** {total_lines_of_code}"
         ),
         inline=False
@@ -2652,7 +4200,7 @@ async def gud_boy_slash(interaction: discord.Interaction):
 
 @bot.tree.command(name="leaderboard", description="Show various leaderboards and statistics")
 async def leaderboard_slash(interaction: discord.Interaction):
-    embed = await get_leaderboard_embed("general")
+    embed = await leaderboard_embeds.get("general")
     view = LeaderboardView(interaction, initial_category="general")
     await interaction.response.send_message(embed=embed, view=view)
 
@@ -2700,6 +4248,9 @@ async def on_ready():
 
     spawn_card.start()
     backup_player_data.start()  # Start the backup task
+    compact_inventory_journal.start()
+    checkpoint_stats.start()
+    refresh_blacklist_cache.start()
 
 @bot.event
 async def on_command_error(ctx, error):
@@ -2798,32 +4349,59 @@ async def check_conditions(ctx):
         await ctx.send("We are currently updating the bot, please wait until we are finished.")
         raise commands.CheckFailure("Bot is in test mode.")
 
+async def disable_spawn_message(message, semaphore):
+    """Disable the catch button on an old spawn message."""
+    async with semaphore:
+        try:
+            view = View.from_message(message)
+            for item in view.children:
+                if isinstance(item, Button):
+                    item.disabled = True
+            await message.edit(view=view)
+        except discord.NotFound:
+            logging.info(f"Message {message.id} not found, likely deleted")
+        except discord.HTTPException as e:
+            logging.error(f"HTTP error disabling buttons: {e}")
+        except Exception as e:
+            logging.error(f"Error disabling buttons on message {message.id}: {e}")
+
+async def send_spawn(channel, card, spawn_title, semaphore):
+    """Send a spawn embed for card to channel, returning the message or None if it failed."""
+    async with semaphore:
+        embed = discord.Embed(title=spawn_title, description="Click the button below to catch it!")
+        embed.set_image(url=card['spawn_image_url'])
+        started = time.perf_counter()
+        try:
+            msg = await channel.send(embed=embed, view=CatchView(card['name']),
+                                    allowed_mentions=discord.AllowedMentions.none())
+        except discord.Forbidden:
+            logging.error(f"Missing permissions to send messages in channel {channel.id}")
+            return None
+        except discord.HTTPException as e:
+            logging.error(f"Failed to send card to channel {channel.id}: {e}")
+            return None
+        except Exception as e:
+            logging.error(f"Unexpected error sending card to channel {channel.id}: {e}")
+            return None
+        latency = time.perf_counter() - started
+        spawn_latency_per_channel[channel.id] = latency
+        logging.info(f"Card spawned in channel {channel.id}: {card['name']} ({latency * 1000:.0f} ms)")
+        return msg
+
 @tasks.loop(minutes=45)
 async def spawn_card():
     global spawned_messages, last_spawned_card_per_channel
     channels = []
     try:
-        # Disable buttons of previous cards
-        for message in spawned_messages:
-            try:
-                view = View.from_message(message)
-                for item in view.children:
-                    if isinstance(item, Button):
-                        item.disabled = True
-                await message.edit(view=view)
-            except discord.NotFound:
-                logging.info(f"Message {message.id} not found, likely deleted")
-            except discord.HTTPException as e:
-                logging.error(f"HTTP error disabling buttons: {e}")
-            except Exception as e:
-                logging.error(f"Error disabling buttons on message {message.id}: {e}")
-        
-        spawned_messages = []
+        semaphore = asyncio.Semaphore(SPAWN_CONCURRENCY)
+        previous_messages, spawned_messages = spawned_messages, []
+        disables = [disable_spawn_message(message, semaphore) for message in previous_messages]
 
         # Get valid channels based on spawn mode
         channels = get_spawn_channels()
         if not channels:
             logging.info("No channels configured for spawning cards.")
+            await asyncio.gather(*disables)
             return
 
         spawn_titles = [
@@ -2832,27 +4410,19 @@ async def spawn_card():
             "Card alert!", "Card incoming!", "Be fast!", "Catch it if you can!",
             "Card on the loose!", "Card on 12'oclock!"
         ]
-        
+
+        sends = []
         for channel in channels:
-            try:
-                last_card_name = last_spawned_card_per_channel.get(channel.id)
-                card = select_random_card(exclude_card_name=last_card_name)
-                last_spawned_card_per_channel[channel.id] = card['name']
-
-                spawn_title = random.choice(spawn_titles)
-                embed = discord.Embed(title=spawn_title, description="Click the button below to catch it!")
-                embed.set_image(url=card['spawn_image_url'])
-
-                msg = await channel.send(embed=embed, view=CatchView(card['name']),
-                                        allowed_mentions=discord.AllowedMentions.none())
-                spawned_messages.append(msg)
-                logging.info(f"Card spawned in channel {channel.id}: {card['name']}")
-            except discord.Forbidden:
-                logging.error(f"Missing permissions to send messages in channel {channel.id}")
-            except discord.HTTPException as e:
-                logging.error(f"Failed to send card to channel {channel.id}: {e}")
-            except Exception as e:
-                logging.error(f"Unexpected error sending card to channel {channel.id}: {e}")
+            last_card_name = last_spawned_card_per_channel.get(channel.id)
+            card = spawn_sampler.sample(exclude_card_name=last_card_name)
+            last_spawned_card_per_channel[channel.id] = card['name']
+            sends.append(send_spawn(channel, card, random.choice(spawn_titles), semaphore))
+
+        # Old buttons are disabled alongside the new sends, so a wave is about one round-trip
+        started = time.perf_counter()
+        _, messages = await asyncio.gather(asyncio.gather(*disables), asyncio.gather(*sends))
+        spawned_messages = [msg for msg in messages if msg is not None]
+        logging.info(f"Spawn wave sent to {len(spawned_messages)}/{len(channels)} channels in {time.perf_counter() - started:.2f}s")
 
     except Exception as e:
         logging.error(f"An error occurred during card spawn: {e}", exc_info=True)
@@ -2867,7 +4437,7 @@ async def spawn_card():
 #=================================================================
 # Handle shutdown signal
 def handle_shutdown_signal(signal, frame):
-    save_player_cards()  # Save player cards on shutdown
+    # shutdown_bot() compacts the journal before closing
     loop = asyncio.get_event_loop()
     loop.create_task(shutdown_bot())
 
@@ -2907,16 +4477,21 @@ async def shutdown_bot():
             logging.error(f"Channel not found.")
     
     logging.info("235th dex going offline")
-    create_backup()
+    await backup_player_cards()
     await bot.close()
 
 if __name__ == "__main__":
+    # Only once: on_ready runs again after a reconnect and would throw away stats and events that aren't checkpointed yet
+    load_stats()
+    logging.info(f"Replayed {activity_log.load()} activity events logged since the last rollup checkpoint")
+
     retry_count = 0
     max_retries = 5
 
     while retry_count < max_retries:
         try:
             bot.run(token)
+            persistence_worker.stop()  # Flush writes queued while shutting down
             break
         except discord.errors.ConnectionClosed as e:
             retry_count += 1
@@ -2933,7 +4508,6 @@ if __name__ == "__main__":
     if retry_count >= max_retries:
         logging.critical(f"Failed to connect after {max_retries} attempts. Giving up.")
         # Save data before exiting to prevent data loss
-        save_player_cards()
-        create_backup()
+        storage.create_backup()
         print(f"Bot shutdown after {max_retries} failed connection attempts. Check logs for details.")
         exit(1)
\ No newline at end of file
@@ -0,0 +1,58 @@
+# Weighted spawn sampling
+# Kept out of dextest.py so test_spawn_sampler.py can import it without a bot token
+import random
+
+class SpawnSampler:
+    """Weighted card picker using Vose's alias method, so each draw is O(1).
+
+    A card's weight is its rarity, and cards with a rarity of 0 never spawn.
+    Tables that leave one card out (so a channel doesn't get the same card twice
+    in a row) are built the first time they're needed and reused after that.
+    Tests hand in their own seeded rng.
+    """
+    def __init__(self, card_list, rng=None):
+        self.cards = tuple(card_list)
+        self.rng = rng or random
+        self._table = self._build(self.cards)
+        self._excluding = {}
+
+    @staticmethod
+    def _build(card_list):
+        card_list = tuple(card for card in card_list if card['rarity'] > 0)
+        n = len(card_list)
+        if n == 0:
+            return None
+        total = sum(card['rarity'] for card in card_list)
+        scaled = [card['rarity'] * n / total for card in card_list]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Whatever is left over is 1.0 up to rounding error
+        return card_list, prob, alias
+
+    def _draw(self, table):
+        card_list, prob, alias = table
+        i = self.rng.randrange(len(card_list))
+        return card_list[i] if self.rng.random() < prob[i] else card_list[alias[i]]
+
+    def _table_excluding(self, card_name):
+        if card_name not in self._excluding:
+            self._excluding[card_name] = self._build(
+                tuple(card for card in self.cards if card['name'] != card_name))
+        return self._excluding[card_name]
+
+    def sample(self, exclude_card_name=None):
+        """Pick a random card weighted by rarity, optionally never picking exclude_card_name."""
+        table = self._table_excluding(exclude_card_name) if exclude_card_name else self._table
+        if table is None:
+            table = self._table
+        if table is None:
+            return self.rng.choice(self.cards)  # fallback, should not happen
+        return self._draw(table)
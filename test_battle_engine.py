@@ -0,0 +1,52 @@
+# Checks for battle_engine against teams from cards.py
+# Run with: python -m pytest test_battle_engine.py
+import copy
+import random
+
+from cards import cards
+from battle_engine import battle_card, simulate_battle, replay_battle, estimate_win_rate, CHALLENGER, OPPONENT
+
+SEED = 235
+
+def team(rng: random.Random, size: int) -> list[dict]:
+    return [battle_card(card) for card in rng.sample(cards, size)]
+
+def battles(count: int = 200):
+    rng = random.Random(SEED)
+    for _ in range(count):
+        challenger, opponent = team(rng, rng.randint(1, 3)), team(rng, rng.randint(1, 3))
+        yield challenger, opponent, simulate_battle(challenger, opponent, random.Random(rng.random()))
+
+def test_same_seed_same_battle():
+    rng = random.Random(SEED)
+    challenger, opponent = team(rng, 3), team(rng, 3)
+    assert simulate_battle(challenger, opponent, random.Random(1)) == simulate_battle(challenger, opponent, random.Random(1))
+    assert estimate_win_rate(challenger, opponent, 50, seed=7) == estimate_win_rate(challenger, opponent, 50, seed=7)
+
+def test_teams_not_modified():
+    rng = random.Random(SEED)
+    challenger, opponent = team(rng, 3), team(rng, 2)
+    before = copy.deepcopy((challenger, opponent))
+    result = simulate_battle(challenger, opponent, random.Random(1))
+    list(replay_battle(challenger, opponent, result.turns))
+    assert (challenger, opponent) == before
+
+def test_winner_lands_the_last_hit():
+    for challenger, opponent, result in battles():
+        last = result.turns[-1]
+        assert last.side == result.winner
+        assert last.defender_health <= 0
+        assert result.winner in (CHALLENGER, OPPONENT)
+
+def test_replay_matches_simulation():
+    for challenger, opponent, result in battles():
+        health = ([card['health'] for card in challenger], [card['health'] for card in opponent])
+        for number, turn, living in replay_battle(challenger, opponent, result.turns):
+            assert turn is result.turns[number - 1]
+            health[1 - turn.side][turn.defender] -= turn.damage
+            assert health[1 - turn.side][turn.defender] == turn.defender_health
+            for side, cards_in_team in enumerate((challenger, opponent)):
+                expected = [[card['name'], hp] for card, hp in zip(cards_in_team, health[side]) if hp > 0]
+                assert living[side] == expected
+        assert not living[1 - result.winner]
+        assert living[result.winner]
@@ -0,0 +1,51 @@
+# Statistical checks for spawn_sampling.SpawnSampler against the real card list
+# Run with: python -m pytest test_spawn_sampler.py
+import math
+import random
+from collections import Counter
+
+from cards import cards
+from spawn_sampling import SpawnSampler
+
+DRAWS = 200_000
+SEED = 235
+
+def chi_squared_critical(degrees_of_freedom: int, z: float = 3.09) -> float:
+    """Upper 0.1% critical value of the chi-squared distribution (Wilson-Hilferty approximation)."""
+    k = degrees_of_freedom
+    return k * (1 - 2 / (9 * k) + z * math.sqrt(2 / (9 * k))) ** 3
+
+def assert_matches_rarity(counts: Counter, card_list: list) -> None:
+    spawnable = [card for card in card_list if card['rarity'] > 0]
+    total = sum(card['rarity'] for card in spawnable)
+    draws = sum(counts.values())
+    chi_squared = sum((counts[card['name']] - draws * card['rarity'] / total) ** 2 / (draws * card['rarity'] / total)
+                      for card in spawnable)
+    critical = chi_squared_critical(len(spawnable) - 1)
+    assert chi_squared < critical, f"chi-squared {chi_squared:.1f} over {critical:.1f}"
+
+def draw(sampler: SpawnSampler, exclude_card_name=None) -> Counter:
+    return Counter(sampler.sample(exclude_card_name)['name'] for _ in range(DRAWS))
+
+def test_distribution_matches_rarity():
+    counts = draw(SpawnSampler(cards, random.Random(SEED)))
+    assert_matches_rarity(counts, cards)
+
+def test_distribution_matches_rarity_excluding_a_card():
+    excluded = max((card for card in cards if card['rarity'] > 0), key=lambda card: card['rarity'])
+    counts = draw(SpawnSampler(cards, random.Random(SEED)), excluded['name'])
+    assert counts[excluded['name']] == 0
+    assert_matches_rarity(counts, [card for card in cards if card['name'] != excluded['name']])
+
+def test_rarity_zero_cards_never_spawn():
+    never = {card['name'] for card in cards if card['rarity'] == 0}
+    assert never, "cards.py has no rarity 0 cards to check"
+    sampler = SpawnSampler(cards, random.Random(SEED))
+    some_card = next(card['name'] for card in cards if card['rarity'] > 0)
+    assert not never & set(draw(sampler))
+    assert not never & set(draw(sampler, some_card))
+
+def test_same_seed_same_draws():
+    first = SpawnSampler(cards, random.Random(SEED))
+    second = SpawnSampler(cards, random.Random(SEED))
+    assert [first.sample()['name'] for _ in range(100)] == [second.sample()['name'] for _ in range(100)]